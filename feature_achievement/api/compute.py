@@ -0,0 +1,439 @@
+import json
+from itertools import chain
+
+from feature_achievement.api.jobs import QUEUED, SUCCEEDED, RunProgress, worker_id
+from feature_achievement.db.crud import (
+    STORAGE_ROWS,
+    copy_run_edges,
+    load_chapter_texts,
+    load_run_chapter_shas,
+    persist_edges,
+    persist_books_and_chapters,
+    persist_run_chapters,
+    set_run_state,
+)
+from feature_achievement.db.migrations import ensure_edge_partition
+from feature_achievement.db.models import Run
+from feature_achievement.enrichment import load_all_enriched_data
+from feature_achievement.retrieval.candidates.tfidf_token import (
+    TfidfTokenCandidateGenerator,
+)
+from feature_achievement.retrieval.candidates.sparse_token import (
+    SparseTokenCandidateGenerator,
+)
+from feature_achievement.retrieval.candidates.ann_embedding import (
+    EmbeddingAnnCandidateGenerator,
+)
+from feature_achievement.retrieval.candidates.minhash_lsh import (
+    MinHashLshCandidateGenerator,
+)
+from feature_achievement.retrieval.similarity.tfidf import TfidfSimilarityScorer
+from feature_achievement.retrieval.similarity.embedding import EmbeddingSimilarityScorer
+from feature_achievement.retrieval.pipeline import RetrievalPipeline
+from feature_achievement.retrieval.edge_generation import (
+    batch_edges,
+    iter_edge_blocks,
+    mutual_knn_filter,
+)
+from feature_achievement.retrieval.all_pairs import iter_all_pairs_edge_blocks
+from feature_achievement.retrieval.utils.text import collect_chapter_texts
+from feature_achievement.retrieval.utils.tfidf import (
+    token_ids_to_strings,
+    build_token_index,
+    has_terms,
+)
+from feature_achievement.retrieval.index_cache import RetrievalIndexCache
+from feature_achievement.retrieval.incremental import (
+    diff_chapters,
+    idf_drift,
+    parent_corpus,
+    vocabulary_coverage,
+)
+from feature_achievement.retrieval.utils.embedding_store import text_sha
+
+from .routers.compute_edges_request import ComputeEdgesRequest
+
+BOOKS_CONFIG = "book_content/books.yaml"
+
+
+def uses_embeddings(req: ComputeEdgesRequest) -> bool:
+    return req.similarity == "embedding" or req.candidate_generator == "embedding_ann"
+
+
+def uses_tfidf(req: ComputeEdgesRequest) -> bool:
+    """Whether the run's candidates or scores come from the TF-IDF index."""
+    return req.similarity != "embedding" or req.candidate_generator not in (
+        "embedding_ann",
+        "all_pairs",
+    )
+
+
+def build_retrieval_pipeline(
+    req: ComputeEdgesRequest,
+    chapter_texts: dict,
+    index_cache: RetrievalIndexCache,
+    progress: RunProgress,
+    base_texts: dict = None,
+) -> RetrievalPipeline:
+    """
+    base_texts: fit TF-IDF on these texts instead (fixed vocabulary) and only
+    transform chapter_texts with it.
+    """
+    # 2️⃣ build TF-IDF index（retrieval 的公共资源, cached on disk by corpus hash）
+    with progress.stage("index"):
+        if base_texts is None:
+            index_key, tfidf_index = index_cache.get_or_build_tfidf_index(
+                chapter_texts, n_features=req.tfidf_hash_features
+            )
+        else:
+            index_key, tfidf_index = index_cache.get_or_build_fixed_vocabulary_index(
+                chapter_texts, base_texts, n_features=req.tfidf_hash_features
+            )
+
+    embedding_index = None
+    if uses_embeddings(req):
+        with progress.stage("embeddings"):
+            embedding_index = index_cache.get_or_build_embedding_index(
+                chapter_texts,
+                model_name=req.embedding_model,
+            )
+
+    # 3️⃣ + 4️⃣ build candidate resources, assemble candidate generator
+    with progress.stage("candidates"):
+        if req.candidate_generator == "embedding_ann":
+            candidate_generator = EmbeddingAnnCandidateGenerator(
+                embedding_index,
+                top_k=req.ann_top_k,
+                radius=req.ann_radius,
+                nprobe=req.ann_nprobe,
+                index_path=index_cache.ann_index_path(
+                    chapter_texts, req.embedding_model
+                ),
+            )
+        elif req.candidate_generator == "minhash_lsh":
+            candidate_generator = MinHashLshCandidateGenerator(
+                tfidf_index, bands=req.lsh_bands, rows=req.lsh_rows
+            )
+        elif req.candidate_generator == "sparse_token":
+            # token ids are enough here, no need to map them back to strings
+            chapter_top_tokens = index_cache.get_or_build_top_token_ids(
+                index_key, tfidf_index, top_n=20
+            )
+            candidate_generator = SparseTokenCandidateGenerator(
+                chapter_top_tokens=chapter_top_tokens,
+                min_shared_tokens=2,
+            )
+        else:
+            chapter_top_tokens = token_ids_to_strings(
+                tfidf_index,
+                index_cache.get_or_build_top_token_ids(
+                    index_key, tfidf_index, top_n=20
+                ),
+            )
+            token_index = build_token_index(chapter_top_tokens)
+            candidate_generator = TfidfTokenCandidateGenerator(
+                chapter_top_tokens=chapter_top_tokens,
+                token_index=token_index,
+                min_shared_tokens=2,
+            )
+
+    # 5️⃣ assemble similarity scorer
+    if req.similarity == "embedding":
+        similarity_scorer = EmbeddingSimilarityScorer(embedding_index)
+    else:
+        similarity_scorer = TfidfSimilarityScorer(tfidf_index)
+
+    # 6️⃣ assemble retrieval pipeline
+    return RetrievalPipeline(
+        candidate_generator=candidate_generator,
+        similarity_scorer=similarity_scorer,
+        min_score=req.min_score,
+        top_k=req.top_k,
+    )
+
+
+def build_all_pairs_source(
+    req: ComputeEdgesRequest,
+    chapter_texts: dict,
+    index_cache: RetrievalIndexCache,
+    progress: RunProgress,
+):
+    """
+    candidate_generator="all_pairs": no candidates, just the matrix whose
+    rows are scored against each other.
+    Return:
+        (matrix, chapter_ids, edge_type)
+    """
+    if req.similarity == "embedding":
+        with progress.stage("embeddings"):
+            embedding_index = index_cache.get_or_build_embedding_index(
+                chapter_texts,
+                model_name=req.embedding_model,
+            )
+        return (
+            embedding_index["embeddings"],
+            embedding_index["chapter_ids"],
+            "embedding",
+        )
+
+    with progress.stage("index"):
+        _, tfidf_index = index_cache.get_or_build_tfidf_index(
+            chapter_texts, n_features=req.tfidf_hash_features
+        )
+    return tfidf_index["tfidf_matrix"], tfidf_index["chapter_ids"], "tfidf"
+
+
+def create_run(session, req: ComputeEdgesRequest, state: str = QUEUED) -> Run:
+    """Insert (and commit) the Run row for req, owned by this process."""
+    run = Run(
+        book_ids=json.dumps(req.book_ids),
+        enrichment_version=req.enrichment_version,
+        candidate_generator=req.candidate_generator,
+        similarity=req.similarity,
+        min_store=req.min_score,
+        top_k=req.top_k,
+        embedding_model=req.embedding_model if uses_embeddings(req) else None,
+        tfidf_hash_features=req.tfidf_hash_features if uses_tfidf(req) else None,
+        storage=req.storage,
+        parent_run_id=req.parent_run_id,
+        state=state,
+        worker=worker_id(),
+    )
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    return run
+
+
+def check_parent_run(req: ComputeEdgesRequest, parent: Run):
+    """
+    Return:
+        None if req can be derived incrementally from parent, else the reason
+    """
+    if parent.similarity != req.similarity:
+        return f"parent run used similarity={parent.similarity!r}"
+    if parent.candidate_generator != req.candidate_generator:
+        return f"parent run used candidate_generator={parent.candidate_generator!r}"
+    if req.min_score < parent.min_store:
+        return f"min_score below the parent run's {parent.min_store}"
+    if req.candidate_generator == "all_pairs":
+        return "all_pairs runs are full rebuilds"
+    if uses_embeddings(req) and parent.embedding_model != req.embedding_model:
+        return f"parent run used embedding_model={parent.embedding_model!r}"
+    if uses_tfidf(req) and parent.tfidf_hash_features != req.tfidf_hash_features:
+        return f"parent run used tfidf_hash_features={parent.tfidf_hash_features!r}"
+    if req.storage != parent.storage:
+        return f"parent run used storage={parent.storage!r}"
+    if req.top_k is not None or parent.top_k is not None or req.mutual_knn:
+        # new chapters can push reused edges out of a source's top-k
+        return "top_k / mutual_knn runs must be computed in full"
+    return None
+
+
+def plan_incremental(req: ComputeEdgesRequest, chapter_texts, session, index_cache):
+    """
+    Decide which chapters must be re-scored against the parent run.
+    Return:
+        {
+            "dirty": set(chapter_id),    new or edited chapters
+            "full_refit": bool,          rescore everything: IDF drifted too far,
+                                         the parent vocabulary misses too much
+                                         of the dirty text, or the parent
+                                         corpus is gone
+            "idf_drift": float | None,
+            "vocabulary_coverage": float | None,
+            "base_texts": dict | None,   parent corpus, for vocabulary="fixed"
+        }
+    """
+    parent = session.get(Run, req.parent_run_id)
+    parent_shas = load_run_chapter_shas(session, parent.id)
+    if not parent_shas:
+        # parent stored before text snapshots: nothing is known to be unchanged
+        return {
+            "dirty": set(chapter_texts),
+            "full_refit": True,
+            "idf_drift": None,
+            "vocabulary_coverage": None,
+            "base_texts": None,
+        }
+
+    plan = {
+        "dirty": diff_chapters(chapter_texts, parent_shas),
+        "full_refit": False,
+        "idf_drift": None,
+        "vocabulary_coverage": None,
+        "base_texts": None,
+    }
+    needs_parent_corpus = req.vocabulary == "fixed" or req.similarity != "embedding"
+    if not needs_parent_corpus:
+        return plan
+
+    # chapter_text may have been overwritten by later runs since the parent
+    old_texts = parent_corpus(
+        parent_shas, load_chapter_texts(session, json.loads(parent.book_ids))
+    )
+    if old_texts is None:
+        # cannot rebuild the parent's vocabulary / IDF: rescore everything
+        plan["full_refit"] = True
+    elif req.vocabulary == "fixed":
+        # terms the parent never saw are dropped from the dirty chapters'
+        # vectors, inflating their scores: refit when too much is missing
+        _, base_index = index_cache.get_or_build_tfidf_index(
+            old_texts, n_features=req.tfidf_hash_features
+        )
+        plan["vocabulary_coverage"] = vocabulary_coverage(
+            base_index["vectorizer"], [chapter_texts[cid] for cid in plan["dirty"]]
+        )
+        plan["full_refit"] = plan["vocabulary_coverage"] < req.min_vocabulary_coverage
+        if not plan["full_refit"]:
+            plan["base_texts"] = old_texts
+    else:
+        # tfidf scores of unchanged pairs move with the IDF of the new corpus
+        _, old_index = index_cache.get_or_build_tfidf_index(
+            old_texts, n_features=req.tfidf_hash_features
+        )
+        _, new_index = index_cache.get_or_build_tfidf_index(
+            chapter_texts, n_features=req.tfidf_hash_features
+        )
+        plan["idf_drift"] = idf_drift(old_index["vectorizer"], new_index["vectorizer"])
+        plan["full_refit"] = plan["idf_drift"] > req.idf_drift_tolerance
+
+    return plan
+
+
+def execute_run(
+    req: ComputeEdgesRequest,
+    run_id: int,
+    session,
+    index_cache: RetrievalIndexCache,
+    progress: RunProgress = None,
+) -> dict:
+    """
+    Load books, build the retrieval pipeline, generate and persist edges
+    for an existing Run row.
+    With req.parent_run_id, edges between unchanged chapters are copied from
+    the parent run and only pairs touching new/edited chapters are scored.
+    A corpus without indexable text finishes as a run with no edges.
+    Return:
+        {"run_id", "count", "persist", "incremental"?}
+    """
+    progress = progress or RunProgress(run_id)
+
+    if req.storage == STORAGE_ROWS:
+        ensure_edge_partition(session.get_bind(), run_id)
+
+    # 1️⃣ load enriched data（和以前一模一样)
+    with progress.stage("load"):
+        enriched_books = load_all_enriched_data(BOOKS_CONFIG)
+        enriched_books = [b for b in enriched_books if b["book_id"] in req.book_ids]
+        chapter_texts = collect_chapter_texts(enriched_books)
+        # no chapters, or nothing but stop words: no index to build, no edges
+        empty_corpus = not has_terms(chapter_texts.values())
+
+    plan = None
+    if req.parent_run_id is not None and not empty_corpus:
+        with progress.stage("diff"):
+            plan = plan_incremental(req, chapter_texts, session, index_cache)
+
+    retrieval_pipeline = all_pairs_source = None
+    if empty_corpus:
+        pass
+    elif req.candidate_generator == "all_pairs":
+        all_pairs_source = build_all_pairs_source(
+            req, chapter_texts, index_cache, progress
+        )
+    else:
+        retrieval_pipeline = build_retrieval_pipeline(
+            req,
+            chapter_texts,
+            index_cache,
+            progress,
+            base_texts=plan["base_texts"] if plan else None,
+        )
+
+    with progress.stage("persist_chapters"):
+        # incremental runs need the stored texts to follow the new corpus
+        persist_books_and_chapters(
+            enriched_books,
+            session,
+            update_text=req.update_chapter_text or plan is not None,
+        )
+        # committed with the edges: what the next incremental run diffs against
+        persist_run_chapters(
+            session,
+            run_id,
+            {cid: text_sha(text) for cid, text in chapter_texts.items()},
+        )
+
+    dirty_ids = None
+    reused = 0
+    if plan is not None and not plan["full_refit"]:
+        dirty_ids = plan["dirty"]
+        with progress.stage("reuse_edges"):
+            reused = copy_run_edges(
+                session,
+                req.parent_run_id,
+                run_id,
+                set(chapter_texts) - dirty_ids,
+                min_score=req.min_score,
+                storage=req.storage,
+            )
+
+    # 7️⃣ run edge generation（真正的“跑图”）, streamed batch by batch into the
+    # bulk writer so memory stays flat however large the run is
+    with progress.stage("edges"):
+        if empty_corpus:
+            edge_blocks = iter(())
+        elif retrieval_pipeline is None:
+            matrix, chapter_ids, edge_type = all_pairs_source
+            edge_blocks = iter_all_pairs_edge_blocks(
+                matrix,
+                chapter_ids,
+                edge_type,
+                min_score=req.min_score,
+                top_k=req.top_k,
+                memory_budget=req.all_pairs_memory_mb * 1024 * 1024,
+                progress_callback=progress.advance,
+            )
+        else:
+            edge_blocks = iter_edge_blocks(
+                enriched_books,
+                retrieval_pipeline,
+                progress_callback=progress.advance,
+                workers=req.workers,
+                dirty_ids=dirty_ids,
+            )
+        if req.mutual_knn:
+            edge_blocks = mutual_knn_filter(edge_blocks)
+        batches = batch_edges(
+            edge_blocks,
+            batch_size=req.persist_chunk_size,
+            max_edges=req.max_edges,
+        )
+        persist_stats = persist_edges(
+            chain.from_iterable(batches),
+            run_id,
+            session,
+            chunk_size=req.persist_chunk_size,
+            storage=req.storage,
+            commit=False,
+        )
+        # the run reads as finished exactly when its last edges are visible
+        set_run_state(session, run_id, SUCCEEDED, finished=True)
+        session.commit()
+
+    result = {
+        "run_id": run_id,
+        "count": persist_stats["rows"] + reused,
+        "persist": persist_stats,
+    }
+    if plan is not None:
+        result["incremental"] = {
+            "parent_run_id": req.parent_run_id,
+            "dirty_chapters": len(plan["dirty"]),
+            "reused_edges": reused,
+            "idf_drift": plan["idf_drift"],
+            "vocabulary_coverage": plan["vocabulary_coverage"],
+            "full_refit": plan["full_refit"],
+        }
+    return result
@@ -12,7 +12,11 @@ from feature_achievement.retrieval.candidates.tfidf_token import (
 )
 from feature_achievement.retrieval.similarity.tfidf import TfidfSimilarityScorer
 from feature_achievement.retrieval.pipeline import RetrievalPipeline
-from feature_achievement.db.engine import get_session
+from feature_achievement.retrieval.index_cache import RetrievalIndexCache
+from feature_achievement.api.graph_cache import GraphResponseCache
+from feature_achievement.api.jobs import JobManager, record_run_state
+from feature_achievement.api.neighbor_index import NeighborIndexCache
+from feature_achievement.db.engine import DB_ASYNC, get_async_session, get_session
 
 
 @lru_cache
@@ -51,5 +55,44 @@ def get_enriched_books():
     return load_all_enriched_data("book_content/books.yaml")
 
 
+@lru_cache
+def get_index_cache() -> RetrievalIndexCache:
+    """
+    One on-disk retrieval index cache per process.
+    """
+    return RetrievalIndexCache()
+
+
+@lru_cache
+def get_graph_cache() -> GraphResponseCache:
+    """
+    Serialized /graph responses of finished runs, shared by all requests.
+    """
+    return GraphResponseCache()
+
+
+@lru_cache
+def get_neighbor_index_cache() -> NeighborIndexCache:
+    """
+    In-memory neighbour index per run, shared by all requests.
+    """
+    return NeighborIndexCache()
+
+
+@lru_cache
+def get_job_manager() -> JobManager:
+    """
+    Process-wide bounded worker pool for mode="job" compute runs.
+    """
+    return JobManager(record_state=record_run_state)
+
+
 def get_db():
     yield from get_session()
+
+
+# Session for the read-only routes: an AsyncSession on the asyncpg engine
+# when CHAPTERGRAPH_DB_ASYNC=1, else the regular one. Use it through
+# db.engine.run_sync. Chosen once here, so the async mode never checks out a
+# sync session as well.
+get_read_session = get_async_session if DB_ASYNC else get_session
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+GRAPH_CACHE_MAX_BYTES = int(
+    os.environ.get("CHAPTERGRAPH_GRAPH_CACHE_MAX_BYTES", 256 * 1024**2)
+)
+# unset: memory only
+GRAPH_CACHE_DIR = os.environ.get("CHAPTERGRAPH_GRAPH_CACHE_DIR") or None
+GRAPH_CACHE_DISK_MAX_BYTES = int(
+    os.environ.get("CHAPTERGRAPH_GRAPH_CACHE_DISK_MAX_BYTES", 1024**3)
+)
+
+
+def graph_cache_key(run_id: int, **params) -> str:
+    """run id + the query parameters that shape the response."""
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"run{run_id}-{digest}"
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class GraphResponseCache:
+    """
+    Serialized /graph responses of finished runs (a finished run's edges
+    never change; the key covers its nodes, see get_graph). In-memory LRU bounded by max_bytes, backed by one file
+    per key under cache_dir when given, so other API processes and restarts
+    reuse it; the files are evicted least-recently-used beyond
+    disk_max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = GRAPH_CACHE_MAX_BYTES,
+        cache_dir: str = GRAPH_CACHE_DIR,
+        disk_max_bytes: int = GRAPH_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (etag, body)
+        self._size = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def get(self, key: str):
+        """
+        Return:
+            (etag, body) or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)  # recency for evict()
+        except FileNotFoundError:
+            return None
+
+        entry = (etag_for(body), body)
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, body: bytes) -> str:
+        entry = (etag_for(body), body)
+        self._remember(key, entry)
+
+        if self.cache_dir and len(body) <= self.disk_max_bytes:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, self._path(key))
+            self.evict(keep=key)
+        return entry[0]
+
+    def evict(self, keep: str = None):
+        """Drop least-recently-used files until cache_dir fits disk_max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+            total += stat.st_size
+
+        for _, name, size in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            if name == f"{keep}.bin":
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _remember(self, key: str, entry):
+        size = len(entry[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, body) = self._entries.popitem(last=False)
+                self._size -= len(body)
@@ -0,0 +1,237 @@
+import gzip
+import json
+import struct
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+GRAPH_BINARY_MEDIA_TYPE = "application/vnd.chaptergraph.graph"
+GRAPH_BINARY_MAGIC = b"CGB2"
+SCORE_BITS = (8, 16)
+
+
+def _varints(values: np.ndarray) -> bytes:
+    """Unsigned LEB128: 7 bits per byte, high bit set on all but the last."""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    for k in range(int(lengths.max(initial=0))):
+        live = lengths > k
+        byte = (values[live] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte[lengths[live] > k + 1] |= np.uint64(0x80)
+        out[starts[live] + k] = byte
+    return out.tobytes()
+
+
+def _read_varints(data: bytes) -> np.ndarray:
+    """Inverse of _varints."""
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shift = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * shift).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def encode_graph_binary(graph: dict, score_bits: int = 16) -> bytes:
+    """
+    Binary /graph payload (little-endian, see graph-core/wire.ts):
+
+        "CGB2"
+        uint32              header length
+        header              UTF-8 JSON, space-padded to a multiple of 4 bytes:
+                            {"ids", "nodes", "edge_types", "n_edges",
+                             "next_cursor", "score_min", "score_max",
+                             "score_bits", "degree_bytes", "target_bytes"}
+        varint[len(ids)]    edges per source, in id order (edges are sorted
+                            by source, then target)
+        varint[n_edges]     target: index into ids for a source's first edge,
+                            then the difference to the previous target
+        uint8[n_edges] x score_bits / 8
+                            score quantized to score_bits over
+                            [score_min, score_max], one byte plane after the
+                            other, most significant first
+        uint8[n_edges]      index into edge_types
+
+    ids interns every chapter/book id once (node ids first, then edge
+    endpoints without a node), so edges carry no strings. Delta-coded sorted
+    targets are mostly one byte, byte planes compress well; a score is off
+    by at most (score_max - score_min) / (2 * (2**score_bits - 1)).
+    """
+    if score_bits not in SCORE_BITS:
+        raise ValueError(f"score_bits must be one of {SCORE_BITS}")
+    nodes = graph["nodes"]
+    edges = graph["edges"]
+
+    ids = [node["id"] for node in nodes]
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    edge_types = []
+    type_index = {}
+
+    n_edges = len(edges)
+    source = np.empty(n_edges, dtype=np.int64)
+    target = np.empty(n_edges, dtype=np.int64)
+    score = np.empty(n_edges, dtype=np.float64)
+    types = np.empty(n_edges, dtype=np.uint8)
+
+    for i, edge in enumerate(edges):
+        for column, node_id in ((source, edge["source"]), (target, edge["target"])):
+            j = index.get(node_id)
+            if j is None:
+                j = index[node_id] = len(ids)
+                ids.append(node_id)
+            column[i] = j
+        t = type_index.get(edge["type"])
+        if t is None:
+            t = type_index[edge["type"]] = len(edge_types)
+            edge_types.append(edge["type"])
+        score[i] = edge["score"]
+        types[i] = t
+
+    order = np.lexsort((target, source))
+    source, target, score, types = (
+        source[order],
+        target[order],
+        score[order],
+        types[order],
+    )
+    degree = np.bincount(source, minlength=len(ids))
+    target_delta = target.copy()
+    same_row = np.zeros(n_edges, dtype=bool)
+    same_row[1:] = source[1:] == source[:-1]
+    target_delta[same_row] -= target[:-1][same_row[1:]]
+
+    score_min = float(score.min()) if n_edges else 0.0
+    score_max = float(score.max()) if n_edges else 0.0
+    levels = (1 << score_bits) - 1
+    span = score_max - score_min
+    quantized = (
+        np.rint((score - score_min) / span * levels) if span > 0 else np.zeros(n_edges)
+    ).astype(np.uint32)
+    planes = [
+        ((quantized >> shift) & 0xFF).astype(np.uint8).tobytes()
+        for shift in range(score_bits - 8, -1, -8)
+    ]
+
+    degree_bytes = _varints(degree)
+    target_bytes = _varints(target_delta)
+    header = json.dumps(
+        {
+            "ids": ids,
+            # ids are already in the table, nodes keep the other fields only
+            "nodes": [{k: v for k, v in n.items() if k != "id"} for n in nodes],
+            "edge_types": edge_types,
+            "n_edges": n_edges,
+            "next_cursor": graph.get("next_cursor"),
+            "score_min": score_min,
+            "score_max": score_max,
+            "score_bits": score_bits,
+            "degree_bytes": len(degree_bytes),
+            "target_bytes": len(target_bytes),
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+
+    return b"".join(
+        [
+            GRAPH_BINARY_MAGIC,
+            struct.pack("<I", len(header)),
+            header,
+            degree_bytes,
+            target_bytes,
+            *planes,
+            types.tobytes(),
+        ]
+    )
+
+
+def decode_graph_binary(body: bytes) -> dict:
+    """
+    Inverse of encode_graph_binary: edges come back sorted by source, then
+    target, with scores dequantized.
+    """
+    if body[:4] != GRAPH_BINARY_MAGIC:
+        raise ValueError("not a CGB2 graph payload")
+    (header_len,) = struct.unpack_from("<I", body, 4)
+    offset = 8 + header_len
+    header = json.loads(body[8:offset])
+    ids = header["ids"]
+    n = header["n_edges"]
+
+    degree = _read_varints(body[offset : offset + header["degree_bytes"]])
+    offset += header["degree_bytes"]
+    target_delta = _read_varints(body[offset : offset + header["target_bytes"]])
+    offset += header["target_bytes"]
+    quantized = np.zeros(n, dtype=np.uint32)
+    for _ in range(header["score_bits"] // 8):
+        plane = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset)
+        quantized = (quantized << 8) | plane
+        offset += n
+    types = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset)
+
+    degree = degree.astype(np.int64)
+    source = np.repeat(np.arange(len(degree)), degree)
+    # running sum of the deltas, minus its value before each row's first
+    # (absolute) target
+    cumulative = np.cumsum(target_delta)
+    firsts = (np.cumsum(degree) - degree)[degree > 0]
+    base = cumulative[firsts] - target_delta[firsts]
+    target = cumulative - np.repeat(base, degree[degree > 0])
+    levels = (1 << header["score_bits"]) - 1
+    span = header["score_max"] - header["score_min"]
+    score = header["score_min"] + quantized * (span / levels)
+    edge_types = header["edge_types"]
+
+    return {
+        "nodes": [{"id": ids[i], **node} for i, node in enumerate(header["nodes"])],
+        "edges": [
+            {
+                "source": ids[s],
+                "target": ids[t],
+                "score": sc,
+                "type": edge_types[ty],
+            }
+            for s, t, sc, ty in zip(
+                source.tolist(), target.tolist(), score.tolist(), types.tolist()
+            )
+        ],
+        "next_cursor": header["next_cursor"],
+    }
+
+
+def negotiate_encoding(accept_encoding: str = None):
+    """br if the client takes it and brotli is installed, else gzip, else None."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
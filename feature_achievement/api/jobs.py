@@ -0,0 +1,250 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from sqlmodel import Session, select
+
+from feature_achievement.db.crud import set_run_state
+from feature_achievement.db.engine import engine
+from feature_achievement.db.models import Run
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("CHAPTERGRAPH_JOB_WORKERS", 2))
+JOB_QUEUE_LIMIT = int(os.environ.get("CHAPTERGRAPH_JOB_QUEUE_LIMIT", 16))
+JOB_HISTORY = int(os.environ.get("CHAPTERGRAPH_JOB_HISTORY", 256))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+def worker_id() -> str:
+    """Run.worker of runs executed by this process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def record_run_state(run_id: int, state: str, error: str = None):
+    """Persist a run's state on its Run row, for other processes and restarts."""
+    with Session(engine) as session:
+        set_run_state(
+            session, run_id, state, error=error, finished=state in FINISHED_STATES
+        )
+        session.commit()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_orphaned_runs() -> list[int]:
+    """
+    Mark runs that a dead process on this host left queued/running as failed.
+    Call at startup, before this process starts runs of its own.
+    Return:
+        the run ids marked failed
+    """
+    host = socket.gethostname()
+    orphaned = []
+    with Session(engine) as session:
+        runs = session.exec(
+            select(Run.id, Run.worker).where(Run.state.in_([QUEUED, RUNNING]))
+        ).all()
+        for run_id, worker in runs:
+            worker_host, _, pid = (worker or "").rpartition(":")
+            if worker_host != host or not pid.isdigit():
+                continue  # another host's run, or not started by an API process
+            pid = int(pid)
+            # a restarted container can reuse the pid of the process it replaced
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            set_run_state(
+                session,
+                run_id,
+                FAILED,
+                error="worker exited before the run finished",
+                finished=True,
+            )
+            orphaned.append(run_id)
+        session.commit()
+    return orphaned
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class RunProgress:
+    """
+    State, per-stage timings and progress of one compute-edges run.
+    Also used by synchronous runs, where nobody polls it.
+    """
+
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+        self.state = QUEUED
+        self.stages = []
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise RunCancelled(f"run {self.run_id} cancelled")
+
+    def request_cancel(self):
+        self._cancel.set()
+
+    @contextmanager
+    def stage(self, name: str):
+        self.check_cancelled()
+        entry = {"name": name, "seconds": None, "done": None, "total": None}
+        with self._lock:
+            self.stages.append(entry)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+
+    def advance(self, done: int, total: int):
+        """Report progress inside the current stage; raises if cancelled."""
+        with self._lock:
+            if self.stages:
+                self.stages[-1]["done"] = done
+                self.stages[-1]["total"] = total
+        self.check_cancelled()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [dict(s) for s in self.stages]
+        return {
+            "run_id": self.run_id,
+            "state": self.state,
+            "stages": stages,
+            "error": self.error,
+            "result": self.result,
+            "queued_seconds": (
+                round(self.started_at - self.created_at, 3) if self.started_at else None
+            ),
+            "elapsed_seconds": (
+                round((self.finished_at or time.time()) - self.started_at, 3)
+                if self.started_at
+                else None
+            ),
+        }
+
+
+class JobManager:
+    """
+    Bounded worker pool for compute-edges runs.
+    At most `workers` runs execute at once; at most `queue_limit` runs may be
+    queued or running before submit() refuses new ones.
+    record_state(run_id, state, error) persists every state change.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_limit: int = JOB_QUEUE_LIMIT,
+        history: int = JOB_HISTORY,
+        record_state=None,
+    ):
+        self.queue_limit = queue_limit
+        self.history = history
+        self.record_state = record_state
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="compute-edges"
+        )
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _active(self) -> int:
+        return sum(1 for p in self.jobs.values() if p.state not in FINISHED_STATES)
+
+    def _prune(self):
+        finished = [rid for rid, p in self.jobs.items() if p.state in FINISHED_STATES]
+        for run_id in finished[: max(0, len(finished) - self.history)]:
+            del self.jobs[run_id]
+
+    def submit(self, run_id: int, fn) -> RunProgress:
+        """
+        Queue fn(progress) -> result dict for run_id.
+        """
+        with self._lock:
+            if self._active() >= self.queue_limit:
+                raise JobQueueFull(f"{self.queue_limit} runs already queued")
+            progress = RunProgress(run_id)
+            self.jobs[run_id] = progress
+            self._prune()
+
+        self.executor.submit(self._execute, progress, fn)
+        return progress
+
+    def _set_state(self, progress: RunProgress, state: str):
+        progress.state = state
+        if self.record_state is None:
+            return
+        try:
+            self.record_state(progress.run_id, state, progress.error)
+        except Exception:
+            logger.exception("could not record state of run %s", progress.run_id)
+
+    def _execute(self, progress: RunProgress, fn):
+        try:
+            progress.check_cancelled()  # cancelled while still queued
+            progress.started_at = time.time()
+            self._set_state(progress, RUNNING)
+            progress.result = fn(progress)
+            self._set_state(progress, SUCCEEDED)
+        except RunCancelled:
+            self._set_state(progress, CANCELLED)
+        except Exception as exc:  # surfaced through the status endpoint
+            progress.error = f"{type(exc).__name__}: {exc}"
+            self._set_state(progress, FAILED)
+        finally:
+            progress.finished_at = time.time()
+
+    def get(self, run_id: int):
+        return self.jobs.get(run_id)
+
+    def cancel(self, run_id: int):
+        """
+        Return:
+            the RunProgress, or None if the run is not tracked
+        """
+        progress = self.jobs.get(run_id)
+        if progress is not None and progress.state not in FINISHED_STATES:
+            progress.request_cancel()
+        return progress
+
+    def shutdown(self):
+        for progress in list(self.jobs.values()):
+            progress.request_cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # queued jobs never start now; running ones record their own state
+        for progress in list(self.jobs.values()):
+            if progress.state == QUEUED:
+                self._set_state(progress, CANCELLED)
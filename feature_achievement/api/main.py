@@ -1,8 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from feature_achievement.api.routers import edges
+from feature_achievement.api.deps import get_job_manager
+from feature_achievement.api.jobs import fail_orphaned_runs
+from feature_achievement.api.routers import edges, jobs, neighbors
+from feature_achievement.db.engine import check_async_config
+from feature_achievement.model_registry import preload
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_async_config()
+    # models listed in CHAPTERGRAPH_PRELOAD_MODELS; everything else loads lazily
+    preload()
+    # runs a previous process on this host left unfinished
+    fail_orphaned_runs()
+    yield
+    get_job_manager().shutdown()
+
 
-app = FastAPI(title="ChapterGraph API")
+app = FastAPI(title="ChapterGraph API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,3 +34,5 @@ app.add_middleware(
 )
 
 app.include_router(edges.router)
+app.include_router(jobs.router)
+app.include_router(neighbors.router)
@@ -0,0 +1,270 @@
+import heapq
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+NEIGHBOR_INDEX_RUNS = int(os.environ.get("CHAPTERGRAPH_NEIGHBOR_INDEX_RUNS", 8))
+
+
+class RunGraphIndex:
+    """
+    Undirected adjacency of one run's edges in CSR form, each row sorted by
+    score (best first). a -> b and b -> a collapse into one neighbour pair
+    with the higher score.
+
+        chapter_ids  list[str]          row id -> chapter id
+        indptr       int64[n + 1]
+        neighbors    int32[nnz]         row ids
+        scores       float64[nnz]       same values as /graph returns
+    """
+
+    def __init__(self, chapter_ids, indptr, neighbors, scores):
+        self.chapter_ids = chapter_ids
+        self.id_to_idx = {cid: i for i, cid in enumerate(chapter_ids)}
+        self.indptr = indptr
+        self.neighbors = neighbors
+        self.scores = scores
+        # -log(score): path strength is a product, path cost a sum
+        self.costs = -np.log(np.clip(scores, 1e-12, 1.0))
+
+    @classmethod
+    def from_edges(cls, from_ids, to_ids, scores):
+        from_ids = np.asarray(from_ids, dtype=object)
+        to_ids = np.asarray(to_ids, dtype=object)
+        chapter_ids, codes = np.unique(
+            np.concatenate([from_ids, to_ids]), return_inverse=True
+        )
+        n, m = len(chapter_ids), len(from_ids)
+
+        src = np.concatenate([codes[:m], codes[m:]])
+        dst = np.concatenate([codes[m:], codes[:m]])
+        score = np.concatenate([scores, scores]).astype(np.float64)
+
+        # one entry per (src, dst), keeping the best score
+        order = np.lexsort((-score, dst, src))
+        src, dst, score = src[order], dst[order], score[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst, score = src[first], dst[first], score[first]
+
+        # rows by source, best score first, ties by row id
+        order = np.lexsort((dst, -score, src))
+        src, dst, score = src[order], dst[order], score[order]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+        return cls(chapter_ids.tolist(), indptr, dst.astype(np.int32), score)
+
+    def __contains__(self, chapter_id: str) -> bool:
+        return chapter_id in self.id_to_idx
+
+    def _row(self, i: int):
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.neighbors[lo:hi], self.scores[lo:hi]
+
+    def top_neighbors(self, chapter_id: str, k: int = 10) -> list[dict]:
+        neighbors, scores = self._row(self.id_to_idx[chapter_id])
+        return [
+            {"chapter_id": self.chapter_ids[j], "score": float(s)}
+            for j, s in zip(neighbors[:k].tolist(), scores[:k].tolist())
+        ]
+
+    def ego_subgraph(
+        self, chapter_id: str, hops: int = 2, k: int = 10, max_nodes: int = 500
+    ) -> dict:
+        """
+        Nodes reachable in <= hops steps, following each node's k best
+        neighbours, plus every edge among them.
+        """
+        start = self.id_to_idx[chapter_id]
+        depth = {start: 0}
+        frontier = [start]
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for i in frontier:
+                for j in self._row(i)[0][:k].tolist():
+                    if j in depth or len(depth) >= max_nodes:
+                        continue
+                    depth[j] = hop
+                    next_frontier.append(j)
+            frontier = next_frontier
+
+        edges = []
+        for i in depth:
+            neighbors, scores = self._row(i)
+            for j, s in zip(neighbors.tolist(), scores.tolist()):
+                if i < j and j in depth:
+                    edges.append(
+                        {
+                            "source": self.chapter_ids[i],
+                            "target": self.chapter_ids[j],
+                            "score": s,
+                        }
+                    )
+
+        return {
+            "nodes": [
+                {"chapter_id": self.chapter_ids[i], "hop": d} for i, d in depth.items()
+            ],
+            "edges": edges,
+        }
+
+    def strongest_path(self, source_id: str, target_id: str, max_hops: int = 6):
+        """
+        Path whose product of scores is highest (shortest path on -log(score)),
+        at most max_hops edges. Dijkstra first; only when its path is longer
+        than max_hops, a hop-bounded relaxation over the whole CSR.
+        Return:
+            {"chapters": [...], "scores": [...], "strength": float} or None
+        """
+        source, target = self.id_to_idx[source_id], self.id_to_idx[target_id]
+        path = self._dijkstra(source, target)
+        if path is None or len(path) - 1 <= max_hops:
+            return self._path_result(path)
+        return self._path_result(self._hop_bounded(source, target, max_hops))
+
+    def _dijkstra(self, source: int, target: int):
+        """
+        Row ids of the cheapest source -> target path, None if unreachable.
+        Bidirectional (the CSR is symmetric): each side settles only about
+        the nodes closer to it than the meeting point.
+        """
+        costs, n = self.costs, len(self.chapter_ids)
+        dist = np.full((2, n), np.inf)
+        previous = np.full((2, n), -1, dtype=np.int64)
+        done = np.zeros((2, n), dtype=bool)
+        dist[0, source] = dist[1, target] = 0.0
+        heaps = [[(0.0, source)], [(0.0, target)]]
+        best, meet = (0.0, source) if source == target else (math.inf, -1)
+
+        while heaps[0] and heaps[1] and heaps[0][0][0] + heaps[1][0][0] < best:
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            cost, i = heapq.heappop(heaps[side])
+            if done[side, i]:
+                continue
+            done[side, i] = True
+            lo, hi = self.indptr[i], self.indptr[i + 1]
+            neighbors = self.neighbors[lo:hi]
+            candidate = cost + costs[lo:hi]
+
+            through = candidate + dist[1 - side, neighbors]
+            k = int(np.argmin(through)) if len(through) else -1
+            if k >= 0 and through[k] < best:
+                best, meet = float(through[k]), int(neighbors[k])
+
+            # nodes this far out cannot lie on a path cheaper than best
+            better = (candidate < dist[side, neighbors]) & (candidate <= best)
+            neighbors, candidate = neighbors[better], candidate[better]
+            dist[side, neighbors] = candidate
+            previous[side, neighbors] = i
+            for j, c in zip(neighbors.tolist(), candidate.tolist()):
+                heapq.heappush(heaps[side], (c, j))
+
+        if meet < 0:
+            return None
+        forward, backward = [meet], [meet]
+        while forward[-1] != source:
+            forward.append(int(previous[0, forward[-1]]))
+        while backward[-1] != target:
+            backward.append(int(previous[1, backward[-1]]))
+        return forward[::-1] + backward[1:]
+
+    def _hop_bounded(self, source: int, target: int, max_hops: int):
+        """
+        Row ids of the cheapest path with at most max_hops edges: dist[h] is
+        the cheapest walk of exactly h edges, one reduceat over the CSR per hop.
+        """
+        costs, starts = self.costs, self.indptr[:-1]
+        empty = self.indptr[1:] == starts
+        dist = np.full((max_hops + 1, len(self.chapter_ids)), np.inf)
+        dist[0, source] = 0.0
+        for h in range(1, max_hops + 1):
+            if len(self.neighbors):
+                dist[h] = np.minimum.reduceat(
+                    dist[h - 1][self.neighbors] + costs,
+                    np.minimum(starts, len(costs) - 1),
+                )
+            dist[h, empty] = np.inf
+
+        hops = int(np.argmin(dist[:, target]))
+        if not np.isfinite(dist[hops, target]):
+            return None
+        path = [target]
+        for h in range(hops, 0, -1):
+            j = path[-1]
+            lo, hi = self.indptr[j], self.indptr[j + 1]
+            via = dist[h - 1][self.neighbors[lo:hi]] + costs[lo:hi]
+            path.append(int(self.neighbors[lo + int(np.argmin(via))]))
+        return path[::-1]
+
+    def _path_result(self, path):
+        if path is None:
+            return None
+        scores = [self._score(i, j) for i, j in zip(path, path[1:])]
+        return {
+            "chapters": [self.chapter_ids[i] for i in path],
+            "scores": scores,
+            "strength": math.prod(scores) if scores else 1.0,
+        }
+
+    def _score(self, i: int, j: int) -> float:
+        neighbors, scores = self._row(i)
+        return float(scores[np.flatnonzero(neighbors == j)[0]])
+
+
+class NeighborIndexCache:
+    """
+    RunGraphIndex per run, built on first use and evicted least-recently-used
+    beyond max_runs. Concurrent first requests for a run build it once.
+    """
+
+    def __init__(self, max_runs: int = NEIGHBOR_INDEX_RUNS):
+        self.max_runs = max_runs
+        self._indexes = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def cached(self, run_id: int):
+        """The run's index if cached (marked recently used), else None."""
+        with self._lock:
+            index = self._indexes.get(run_id)
+            if index is not None:
+                self._indexes.move_to_end(run_id)
+            return index
+
+    def get(self, run_id: int, load, keep: bool = True) -> RunGraphIndex:
+        """
+        load() -> (from_ids, to_ids, scores) of the run's edges; call only
+        for runs known to exist.
+        keep=False builds without caching (run still being computed).
+        """
+        index = self.cached(run_id)
+        if index is not None:
+            return index
+        with self._lock:
+            run_lock = self._locks.setdefault(run_id, threading.Lock())
+
+        with run_lock:
+            index = self.cached(run_id)
+            if index is not None:
+                return index
+
+            kept = False
+            try:
+                index = RunGraphIndex.from_edges(*load())
+                if keep:
+                    with self._lock:
+                        self._indexes[run_id] = index
+                        while len(self._indexes) > self.max_runs:
+                            evicted, _ = self._indexes.popitem(last=False)
+                            self._locks.pop(evicted, None)
+                    kept = True
+            finally:
+                if not kept:
+                    # only cached runs keep a lock entry
+                    with self._lock:
+                        self._locks.pop(run_id, None)
+            return index
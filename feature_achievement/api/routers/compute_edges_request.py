@@ -1,13 +1,49 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 
 
 class ComputeEdgesRequest(BaseModel):
     book_ids: list[str]
+    mode: Literal["sync", "job"] = "sync"  # job: return run_id now, poll status
     enrichment_version: str = "v1_bullets+sections"
 
+    # "tfidf_token" | "sparse_token" | "embedding_ann" | "minhash_lsh"
+    # | "all_pairs" (no candidates: exact blocked scoring of every pair)
     candidate_generator: str = "tfidf_token"
     similarity: str = "tfidf/embedding"
     embedding_model: str = "all-MiniLM-L6-v2"
+    # hash tokens/bigrams into this many TF-IDF buckets instead of fitting a
+    # vocabulary (memory stays bounded however large the corpus grows)
+    tfidf_hash_features: Optional[int] = None
+
+    # embedding_ann: top-k neighbours, or all within cosine >= ann_radius
+    ann_top_k: int = Field(20, ge=1)
+    ann_radius: Optional[float] = None
+    ann_nprobe: int = Field(8, ge=1)
+    # minhash_lsh: Jaccard threshold ~ (1 / lsh_bands) ** (1 / lsh_rows)
+    lsh_bands: int = Field(32, ge=1)
+    lsh_rows: int = Field(2, ge=1)
+    # all_pairs: memory for one block of source x chapter scores
+    all_pairs_memory_mb: int = 256
 
     min_score: float = 0.1
+    # keep the k best targets per source chapter
+    top_k: Optional[int] = Field(None, ge=1)
+    mutual_knn: bool = False  # keep a -> b only if b -> a is kept too
+    workers: int = Field(1, ge=1)  # >1: score source chapters on a process pool
+
+    update_chapter_text: bool = False  # refresh stored chapter_text if it changed
+    persist_chunk_size: int = Field(5000, gt=0)  # edges per COPY / insert batch
+    # keep only the strongest N edges of this run
+    max_edges: Optional[int] = Field(None, ge=1)
+    # "rows" (edge table) | "compact" (edgecompact: integer chapter keys,
+    # type codes; same API responses, smaller table)
+    storage: Literal["rows", "compact"] = "rows"
+
+    # incremental: reuse the parent run's edges between unchanged chapters
+    parent_run_id: Optional[int] = None
+    vocabulary: str = "refit"  # "refit" | "fixed" (keep the parent's TF-IDF vocabulary)
+    idf_drift_tolerance: float = 0.1  # refit: above this, recompute all pairs
+    # fixed: below this share of a dirty chapter's terms in the parent
+    # vocabulary, refit and recompute all pairs
+    min_vocabulary_coverage: float = 0.9
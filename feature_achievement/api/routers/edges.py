@@ -1,8 +1,15 @@
 from typing import List, Literal, Optional
+import asyncio
 import json
+import logging
+from contextlib import aclosing
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+import anyio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import select, Session
 
@@ -10,29 +17,54 @@ from sqlmodel import select, Session
 #     get_retrieval_pipline,
 #     get_enriched_books,
 # )
-from feature_achievement.db.engine import get_session
-from feature_achievement.db.models import Edge, Chapter, Book, Run
-from feature_achievement.db.crud import persist_edges, persist_books_and_chapters
-from feature_achievement.retrieval.edge_generation import generate_edges
-from feature_achievement.enrichment import load_all_enriched_data
-from .compute_edges_request import ComputeEdgesRequest
-
-from feature_achievement.retrieval.candidates.tfidf_token import (
-    TfidfTokenCandidateGenerator,
+from feature_achievement.api.deps import (
+    get_graph_cache,
+    get_index_cache,
+    get_job_manager,
+    get_read_session,
 )
-from feature_achievement.retrieval.similarity.tfidf import TfidfSimilarityScorer
-from feature_achievement.retrieval.similarity.embedding import EmbeddingSimilarityScorer
-from feature_achievement.retrieval.pipeline import RetrievalPipeline
-from feature_achievement.retrieval.edge_generation import generate_edges
-
-from feature_achievement.retrieval.utils.text import collect_chapter_texts
-
-from feature_achievement.retrieval.utils.tfidf import (
-    build_tfidf_index,
-    extract_top_tfidf_tokens,
-    build_token_index,
+from feature_achievement.api.compute import check_parent_run, create_run, execute_run
+from feature_achievement.api.graph_cache import (
+    GraphResponseCache,
+    etag_for,
+    graph_cache_key,
+)
+from feature_achievement.api.graph_wire import (
+    GRAPH_BINARY_MAGIC,
+    GRAPH_BINARY_MEDIA_TYPE,
+    SCORE_BITS,
+    compress,
+    encode_graph_binary,
+    negotiate_encoding,
+)
+from feature_achievement.api.jobs import (
+    FAILED,
+    FINISHED_STATES,
+    QUEUED,
+    RUNNING,
+    JobManager,
+    JobQueueFull,
+    record_run_state,
 )
-from feature_achievement.retrieval.utils.embedding import build_embedding_index
+from feature_achievement.db.crud import (
+    book_edges_queries,
+    compact_edge,
+    load_book_edges,
+    run_edges_query,
+)
+from feature_achievement.db.engine import (
+    DB_ASYNC,
+    astream_rows,
+    engine,
+    get_session,
+    run_sync,
+    stream_rows,
+)
+from feature_achievement.db.models import Chapter, Book, Run
+from feature_achievement.retrieval.index_cache import RetrievalIndexCache
+from .compute_edges_request import ComputeEdgesRequest
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="", tags=["edges"])
 
@@ -55,6 +87,7 @@ class GraphEdge(BaseModel):
 class GraphResponse(BaseModel):
     nodes: List[GraphNode]
     edges: List[GraphEdge]
+    next_cursor: Optional[int] = None
 
 
 class RunResponse(BaseModel):
@@ -68,84 +101,68 @@ class RunResponse(BaseModel):
 @router.post("/compute-edges")
 def compute_edges(
     req: ComputeEdgesRequest,
+    response: Response,
     session: Session = Depends(get_session),
-    # pipeline=Depends(get_retrieval_pipline),  # 2. 用 run 参数构建 RetrievalPipeline
-    # enriched_books=Depends(get_enriched_books),
+    index_cache: RetrievalIndexCache = Depends(get_index_cache),
+    job_manager: JobManager = Depends(get_job_manager),
 ):
     """
     Run retrieval pipeline and persist edges into database.
-    Return edges count.
+    mode="sync": return edges count when done.
+    mode="job": return run_id right away; poll /runs/{run_id}/status.
     """
+    if req.parent_run_id is not None:
+        parent = session.get(Run, req.parent_run_id)
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent run not found")
+        reason = check_parent_run(req, parent)
+        if reason:
+            raise HTTPException(
+                status_code=400, detail=f"Cannot derive incrementally: {reason}"
+            )
+
     # 1. insert run
-    run = Run(
-        book_ids=json.dumps(req.book_ids),
-        enrichment_version=req.enrichment_version,
-        candidate_generator=req.candidate_generator,
-        similarity=req.similarity,
-        min_store=req.min_score,
-    )
-    session.add(run)
-    session.commit()
-    session.refresh(run)  # 拿到 run.id???
-
-    # 1️⃣ load enriched data（和以前一模一样)
-    enriched_books = load_all_enriched_data("book_content/books.yaml")
-    enriched_books = [b for b in enriched_books if b["book_id"] in req.book_ids]
-    # 2️⃣ build TF-IDF index（retrieval 的公共资源）
-    chapter_texts = collect_chapter_texts(enriched_books)
-    tfidf_index = build_tfidf_index(chapter_texts)
-
-    # 3️⃣ build TF-IDF token candidate resources
-    chapter_top_tokens = extract_top_tfidf_tokens(tfidf_index, top_n=20)
-    token_index = build_token_index(chapter_top_tokens)
-
-    # 4️⃣ assemble candidate generator
-    candidate_generator = TfidfTokenCandidateGenerator(
-        chapter_top_tokens=chapter_top_tokens,
-        token_index=token_index,
-        min_shared_tokens=2,
-    )
+    run = create_run(session, req, state=QUEUED if req.mode == "job" else RUNNING)
+    run_id = run.id  # 拿到 run.id
 
-    # 5️⃣ assemble similarity scorer
-    if req.similarity == "embedding":
-        embedding_index = build_embedding_index(
-            chapter_texts,
-            model_name=req.embedding_model,
-        )
-        similarity_scorer = EmbeddingSimilarityScorer(embedding_index)
-    else:
-        similarity_scorer = TfidfSimilarityScorer(tfidf_index)
+    if req.mode == "job":
 
-    # 6️⃣ assemble retrieval pipeline
-    retrieval_pipeline = RetrievalPipeline(
-        candidate_generator=candidate_generator,
-        similarity_scorer=similarity_scorer,
-        min_score=req.min_score,
-    )
+        def run_job(progress):
+            with Session(engine) as job_session:
+                return execute_run(req, run_id, job_session, index_cache, progress)
 
-    # 7️⃣ run edge generation（真正的“跑图”）
-    edges = generate_edges(enriched_books, retrieval_pipeline)  # 3. compute edges
-    persist_books_and_chapters(enriched_books, session)
-    persist_edges(edges, run.id, session)  # 4. persist edges ??? with run_idS
+        try:
+            job_manager.submit(run_id, run_job)
+        except JobQueueFull as exc:
+            raise HTTPException(status_code=429, detail=str(exc))
+
+        response.status_code = 202
+        return {
+            "run_id": run_id,
+            "state": "queued",
+            "status_url": f"/runs/{run_id}/status",
+        }
+
+    # 2. compute + persist edges in this request
+    try:
+        result = execute_run(req, run_id, session, index_cache)
+    except Exception as exc:
+        session.rollback()
+        record_run_state(run_id, FAILED, f"{type(exc).__name__}: {exc}")
+        raise
 
     return {  # 5. return run_id
-        "run_id": run.id,
-        "count": len(edges),
+        **result,
         "message": "edges computed and stored successfully",
     }
 
 
 @router.get("/edges")
-def list_edges(
+async def list_edges(
     book_id: str,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
     """Query edges by book_id (from_chapter belongs to the book)."""
-    stmt = (
-        select(Edge)
-        .join(Chapter, Edge.from_chapter == Chapter.id)
-        .where(Chapter.book_id == book_id)
-    )
     # stmt = select(Edge).where(
     #     or_(
     #         Edge.from_chapter.like(f"{book_id}%"),
@@ -153,67 +170,186 @@ def list_edges(
     #     )
     # )
 
-    edges = session.exec(stmt).all()
+    edges = await run_sync(session, load_book_edges, book_id)
     return {
         "count": len(edges),
         "edges": edges,
     }
 
 
-@router.get("/graph", response_model=GraphResponse)
-def get_graph(
-    run_id: int,
-    session: Session = Depends(get_session),
-):
-    run = session.get(Run, run_id)
-    if not run:
-        raise HTTPException(status_code=404, detail="Run not found")
-
-    book_ids = json.loads(run.book_ids)
-
-    books = session.exec(select(Book).where(Book.id.in_(book_ids))).all()
-    chapters = session.exec(select(Chapter).where(Chapter.book_id.in_(book_ids))).all()
-    edges = session.exec(select(Edge).where(Edge.run_id == run_id)).all()
+def query_graph(
+    session: Session,
+    run: Run,
+    min_score: Optional[float] = None,
+    book_ids: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    nodes: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Graph of a run as plain dicts (GraphResponse shape), filters in SQL.
+    Edges are paged by their cursor (see run_edges_query); nodes are only
+    sent with the first page, nodes= reuses already loaded graph_nodes.
+    """
+    run_books = _run_books(run, book_ids)
+    edge_stmt = run_edges_query(
+        run,
+        min_score=min_score,
+        book_ids=run_books if book_ids else None,
+        after=cursor,
+        limit=limit,
+    )
+    edges = session.exec(edge_stmt).all()
 
     frontend = {
         "nodes": [],
-        "edges": [],
+        "edges": [
+            {"source": source, "target": target, "score": score, "type": edge_type}
+            for _, source, target, score, edge_type in edges
+        ],
+        "next_cursor": (
+            edges[-1][0] if limit is not None and len(edges) == limit else None
+        ),
     }
+    if cursor is not None:
+        return frontend
 
-    for book in books:
-        frontend["nodes"].append(
-            {
-                "id": book.id,
-                "type": "book",
-                "size": book.size,
-            }
+    frontend["nodes"] = nodes if nodes is not None else graph_nodes(session, run_books)
+    return frontend
+
+
+def _run_books(run: Run, book_ids: Optional[List[str]]) -> List[str]:
+    """The run's books, narrowed to book_ids if given."""
+    run_books = json.loads(run.book_ids)
+    if book_ids:
+        wanted = set(book_ids)
+        run_books = [b for b in run_books if b in wanted]
+    return run_books
+
+
+def graph_nodes(session: Session, run_books: List[str]) -> List[dict]:
+    """Book + chapter nodes (GraphNode shape) of run_books."""
+    books = session.exec(select(Book.id, Book.size).where(Book.id.in_(run_books))).all()
+    chapters = session.exec(
+        select(Chapter.id, Chapter.book_id, Chapter.title).where(
+            Chapter.book_id.in_(run_books)
         )
+    ).all()
 
-    for chapter in chapters:
-        frontend["nodes"].append(
+    nodes = [{"id": book_id, "type": "book", "size": size} for book_id, size in books]
+    for chapter_id, book_id, title in chapters:
+        nodes.append(
             {
-                "id": chapter.id,
+                "id": chapter_id,
                 "type": "chapter",
-                "book_id": chapter.book_id,
-                "title": chapter.title,
+                "book_id": book_id,
+                "title": title,
             }
         )
+    return nodes
 
-    for edge in edges:
-        frontend["edges"].append(
-            {
-                "source": edge.from_chapter,
-                "target": edge.to_chapter,
-                "score": edge.score,
-                "type": edge.type,
-            }
+
+def _render_graph(
+    graph: dict, format: str, encoding: Optional[str], score_bits: int = 16
+) -> bytes:
+    if format == "binary":
+        body = encode_graph_binary(graph, score_bits=score_bits)
+    else:
+        body = json.dumps(graph, separators=(",", ":")).encode("utf-8")
+    return compress(body, encoding)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+@router.get("/graph", response_model=GraphResponse)
+async def get_graph(
+    run_id: int,
+    min_score: Optional[float] = None,
+    book_id: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[int] = None,
+    format: Literal["json", "binary"] = "json",
+    score_bits: int = 16,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    session: Session = Depends(get_read_session),
+    graph_cache: GraphResponseCache = Depends(get_graph_cache),
+):
+    """
+    Nodes + edges of a run.
+    min_score and book_id (repeatable; both ends in those books) filter the
+    edges; limit pages them, pass next_cursor back as cursor for the next page.
+    Responses of finished runs are cached and carry an ETag, so a repeat load
+    with If-None-Match is a 304.
+    format="binary" sends the compact CGB2 encoding (see graph_wire), with
+    scores quantized to score_bits; either format is gzip/br compressed when
+    the client accepts it.
+    """
+    if score_bits not in SCORE_BITS:
+        raise HTTPException(
+            status_code=422, detail=f"score_bits must be one of {SCORE_BITS}"
         )
-    return frontend
+    # run state first: a run reads as finished only once its last edges are
+    # committed, so edges read afterwards are complete
+    run, nodes = await run_sync(session, _load_graph_nodes, run_id, book_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    finished = run.state in FINISHED_STATES
+
+    encoding = negotiate_encoding(accept_encoding)
+    key = graph_cache_key(
+        run_id,
+        # titles and book sizes live in the shared Book/Chapter tables, which
+        # persist_books_and_chapters(update_text=True) rewrites after the run
+        nodes=nodes,
+        min_score=min_score,
+        book_id=sorted(book_id) if book_id else None,
+        limit=limit,
+        cursor=cursor,
+        format=format,
+        # binary bodies depend on the wire version and score precision
+        wire=(GRAPH_BINARY_MAGIC.decode(), score_bits) if format == "binary" else None,
+        encoding=encoding,
+    )
+    cached = graph_cache.get(key)
+    if cached is not None:
+        etag, body = cached
+    else:
+        graph = await run_sync(
+            session, query_graph, run, min_score, book_id, limit, cursor, nodes
+        )
+        # encoding + compression are CPU-bound, keep them off the event loop
+        body = await asyncio.to_thread(
+            _render_graph, graph, format, encoding, score_bits
+        )
+
+        if finished:
+            etag = graph_cache.put(key, body)
+        else:
+            # edges still being written (by any process)
+            etag = etag_for(body)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    media_type = GRAPH_BINARY_MEDIA_TYPE if format == "binary" else "application/json"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _all_runs(session: Session):
+    return session.exec(select(Run).order_by(Run.created_at.desc())).all()
 
 
 @router.get("/runs", response_model=List[RunResponse])
-def list_runs(session: Session = Depends(get_session)):
-    runs = session.exec(select(Run).order_by(Run.created_at.desc())).all()
+async def list_runs(session: Session = Depends(get_read_session)):
+    runs = await run_sync(session, _all_runs)
     return [
         {
             "id": r.id,
@@ -224,3 +360,174 @@ def list_runs(session: Session = Depends(get_session)):
         }
         for r in runs
     ]
+
+
+# ---------- streaming variants: rows go out as they are read ----------
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _row_chunks(stmt):
+    """Async iterator over stmt's rows in chunks, on a session of its own."""
+    if DB_ASYNC:
+        return astream_rows(stmt)
+    return _threaded_row_chunks(stmt)
+
+
+async def _threaded_row_chunks(stmt):
+    """
+    stream_rows, each fetch in a worker thread. Closing this iterator closes
+    the generator (cursor, session) in a worker thread too.
+    """
+    rows = stream_rows(stmt)
+    try:
+        while True:
+            chunk = await anyio.to_thread.run_sync(next, rows, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(rows.close)
+
+
+async def _mapped(chunks, fn):
+    async with aclosing(chunks):
+        async for rows in chunks:
+            yield [fn(row) for row in rows]
+
+
+async def _encode_items(item_chunks, format: str, prefix: str = "", suffix: str = ""):
+    """
+    Items of every async iterator in item_chunks, one JSON document per line
+    (ndjson) or comma-separated between prefix and suffix (json).
+    A read failing mid-stream cannot change the status any more: the error is
+    logged and the stream ends with an {"error": ...} item.
+    """
+    if prefix:
+        yield prefix.encode("utf-8")
+    separator = "\n" if format == "ndjson" else ","
+    first = True
+    try:
+        for chunks in item_chunks:
+            async with aclosing(chunks):
+                async for items in chunks:
+                    if not items:
+                        continue
+                    text = separator.join(
+                        json.dumps(item, separators=(",", ":")) for item in items
+                    )
+                    if format == "ndjson":
+                        text += "\n"
+                    elif not first:
+                        text = "," + text
+                    first = False
+                    yield text.encode("utf-8")
+    except Exception as exc:
+        logger.exception("streaming response failed")
+        text = json.dumps({"error": f"stream aborted: {type(exc).__name__}"})
+        if format == "ndjson":
+            text += "\n"
+        elif not first:
+            text = "," + text
+        yield text.encode("utf-8")
+    if suffix:
+        yield suffix.encode("utf-8")
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body iterator when sending stops,
+    also when the client disconnects, so the row cursors behind it are
+    released right away instead of whenever the generator is collected.
+    """
+
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+def _stream_response(body, format: str) -> StreamingResponse:
+    media_type = NDJSON_MEDIA_TYPE if format == "ndjson" else "application/json"
+    return _ClosingStreamingResponse(body, media_type=media_type)
+
+
+@router.get("/edges/stream")
+async def stream_edges(
+    book_id: str,
+    format: Literal["ndjson", "json"] = "ndjson",
+):
+    """
+    /edges, streamed: one edge per line (ndjson) or a JSON array of edges
+    (json), read through a server-side cursor, so memory stays flat
+    however many edges the book has.
+    """
+    rows_query, compact_query = book_edges_queries(book_id)
+    item_chunks = [
+        _mapped(_row_chunks(rows_query), lambda row: jsonable_encoder(row[0])),
+        _mapped(
+            _row_chunks(compact_query),
+            lambda row: jsonable_encoder(compact_edge(row)),
+        ),
+    ]
+    if format == "ndjson":
+        body = _encode_items(item_chunks, format)
+    else:
+        body = _encode_items(item_chunks, format, prefix="[", suffix="]")
+    return _stream_response(body, format)
+
+
+def _load_graph_nodes(session: Session, run_id: int, book_ids):
+    run = session.get(Run, run_id)
+    if not run:
+        return None, None
+    return run, graph_nodes(session, _run_books(run, book_ids))
+
+
+@router.get("/graph/stream")
+async def stream_graph(
+    run_id: int,
+    min_score: Optional[float] = None,
+    book_id: Optional[List[str]] = Query(None),
+    format: Literal["ndjson", "json"] = "ndjson",
+    session: Session = Depends(get_read_session),
+):
+    """
+    /graph of a whole run, streamed as the edges are read.
+    ndjson: a {"nodes": [...]} line, then one edge per line.
+    json: the GraphResponse document, written incrementally.
+    """
+    run, nodes = await run_sync(session, _load_graph_nodes, run_id, book_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    edge_stmt = run_edges_query(
+        run,
+        min_score=min_score,
+        book_ids=_run_books(run, book_id) if book_id else None,
+    )
+    item_chunks = [
+        _mapped(
+            _row_chunks(edge_stmt),
+            lambda row: {
+                "source": row[1],
+                "target": row[2],
+                "score": row[3],
+                "type": row[4],
+            },
+        )
+    ]
+    nodes = json.dumps(nodes, separators=(",", ":"))
+    if format == "ndjson":
+        body = _encode_items(item_chunks, format, prefix=f'{{"nodes":{nodes}}}\n')
+    else:
+        body = _encode_items(
+            item_chunks,
+            format,
+            prefix=f'{{"nodes":{nodes},"edges":[',
+            suffix='],"next_cursor":null}',
+        )
+    return _stream_response(body, format)
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from feature_achievement.api.deps import get_job_manager, get_read_session
+from feature_achievement.api.jobs import FINISHED_STATES, JobManager
+from feature_achievement.db.engine import run_sync
+from feature_achievement.db.models import Run
+
+router = APIRouter(prefix="/runs", tags=["jobs"])
+
+
+def _stored_status(session: Session, run_id: int):
+    """Status of a run from its Run row (run executed by another process)."""
+    run = session.get(Run, run_id)
+    if not run:
+        return None
+    elapsed = None
+    if run.finished_at is not None:
+        elapsed = round((run.finished_at - run.created_at).total_seconds(), 3)
+    return {
+        "run_id": run_id,
+        "state": run.state,
+        "stages": [],
+        "error": run.error,
+        "result": None,
+        "queued_seconds": None,
+        "elapsed_seconds": elapsed,
+        "worker": run.worker,
+        "finished_at": run.finished_at,
+    }
+
+
+@router.get("/{run_id}/status")
+async def get_run_status(
+    run_id: int,
+    session: Session = Depends(get_read_session),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    State, per-stage progress and timings of a run. Runs this process is not
+    tracking (synchronous, other API process, before a restart) report the
+    state stored on the Run row, without stages.
+    """
+    progress = job_manager.get(run_id)
+    if progress is not None:
+        return progress.to_dict()
+
+    status = await run_sync(session, _stored_status, run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return status
+
+
+@router.post("/{run_id}/cancel")
+def cancel_run(
+    run_id: int,
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    progress = job_manager.get(run_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if progress.state in FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Run already {progress.state}")
+
+    job_manager.cancel(run_id)
+    return {"run_id": run_id, "cancel_requested": True}
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+
+from feature_achievement.api.deps import get_neighbor_index_cache
+from feature_achievement.api.jobs import FINISHED_STATES
+from feature_achievement.api.neighbor_index import NeighborIndexCache, RunGraphIndex
+from feature_achievement.db.crud import run_edges_query
+from feature_achievement.db.engine import get_session
+from feature_achievement.db.models import Chapter, Run
+
+router = APIRouter(prefix="/runs/{run_id}", tags=["neighbors"])
+
+
+def get_run_index(
+    run_id: int,
+    session: Session = Depends(get_session),
+    index_cache: NeighborIndexCache = Depends(get_neighbor_index_cache),
+) -> RunGraphIndex:
+    index = index_cache.cached(run_id)
+    if index is not None:
+        return index
+
+    # state before edges: a finished run's edges are all committed
+    run = session.get(Run, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    def load():
+        rows = session.exec(run_edges_query(run)).all()
+        return (
+            [r[1] for r in rows],
+            [r[2] for r in rows],
+            [r[3] for r in rows],
+        )
+
+    # an index of a run still being written would miss its later edges
+    return index_cache.get(run_id, load, keep=run.state in FINISHED_STATES)
+
+
+def _require_chapter(index: RunGraphIndex, chapter_id: str, session: Session):
+    """True if the chapter has edges in the run; 404 if it does not exist."""
+    if chapter_id in index:
+        return True
+    if not session.get(Chapter, chapter_id):
+        raise HTTPException(status_code=404, detail=f"Chapter {chapter_id} not found")
+    return False
+
+
+@router.get("/chapters/{chapter_id}/neighbors")
+def chapter_neighbors(
+    run_id: int,
+    chapter_id: str,
+    k: int = Query(10, ge=1, le=1000),
+    index: RunGraphIndex = Depends(get_run_index),
+    session: Session = Depends(get_session),
+):
+    """Top-k related chapters of chapter_id in the run, best first."""
+    neighbors = []
+    if _require_chapter(index, chapter_id, session):
+        neighbors = index.top_neighbors(chapter_id, k=k)
+    return {"run_id": run_id, "chapter_id": chapter_id, "neighbors": neighbors}
+
+
+@router.get("/chapters/{chapter_id}/ego")
+def chapter_ego_subgraph(
+    run_id: int,
+    chapter_id: str,
+    hops: int = Query(2, ge=1, le=4),
+    k: int = Query(10, ge=1, le=100),
+    max_nodes: int = Query(500, ge=1, le=5000),
+    index: RunGraphIndex = Depends(get_run_index),
+    session: Session = Depends(get_session),
+):
+    """
+    Chapters within `hops` steps (following each chapter's k best
+    neighbours) and the edges among them.
+    """
+    if not _require_chapter(index, chapter_id, session):
+        return {
+            "run_id": run_id,
+            "nodes": [{"chapter_id": chapter_id, "hop": 0}],
+            "edges": [],
+        }
+    return {
+        "run_id": run_id,
+        **index.ego_subgraph(chapter_id, hops=hops, k=k, max_nodes=max_nodes),
+    }
+
+
+@router.get("/path")
+def related_path(
+    run_id: int,
+    source: str,
+    target: str,
+    max_hops: int = Query(6, ge=1, le=12),
+    index: RunGraphIndex = Depends(get_run_index),
+    session: Session = Depends(get_session),
+):
+    """
+    Chain of related chapters from source to target whose product of edge
+    scores is highest; path is null when they are not connected.
+    """
+    connected = _require_chapter(index, source, session)
+    connected = _require_chapter(index, target, session) and connected
+    path = None
+    if connected:
+        path = index.strongest_path(source, target, max_hops=max_hops)
+    return {"run_id": run_id, "source": source, "target": target, "path": path}
@@ -1,48 +1,532 @@
-from feature_achievement.db.models import Book, Chapter, Edge, Run
+import csv
+import io
+import time
+from datetime import datetime, timezone
+from itertools import chain, islice
 
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.orm import aliased
 
-def persist_books_and_chapters(enriched_books, session):
+from feature_achievement.db.models import (
+    Book,
+    Chapter,
+    ChapterKey,
+    Edge,
+    EdgeCompact,
+    Run,
+    RunChapter,
+)
+
+UPSERT_BATCH_SIZE = 1000
+EDGE_CHUNK_SIZE = 5000
+EDGE_COLUMNS = ("run_id", "from_chapter", "to_chapter", "score", "type", "created_at")
+COMPACT_EDGE_COLUMNS = ("run_id", "from_key", "to_key", "score", "type")
+
+# Run.storage values
+STORAGE_ROWS = "rows"
+STORAGE_COMPACT = "compact"
+# edge type <-> EdgeCompact.type code
+EDGE_TYPE_CODES = {"tfidf": 1, "embedding": 2}
+EDGE_TYPE_NAMES = {code: name for name, code in EDGE_TYPE_CODES.items()}
+
+
+def _dialect_insert(session):
+    """
+    INSERT construct with ON CONFLICT support for the session's backend,
+    None on backends without one (callers fall back to _insert_missing).
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _insert_missing(session, model, rows, key: str = "id", update_columns=()):
+    """
+    Upsert without ON CONFLICT, for backends other than PostgreSQL/SQLite
+    (see _dialect_insert): select the stored rows of this chunk by key,
+    insert the missing ones and update update_columns where they differ.
+    Not safe against concurrent writers of the same keys: a row inserted by
+    another writer between the select and the insert fails the insert with
+    an IntegrityError.
+    """
+    key_column = getattr(model, key)
+    columns = [key_column] + [getattr(model, c) for c in update_columns]
+    stored = {
+        row[0]: row[1:]
+        for row in session.execute(
+            select(*columns).where(key_column.in_([r[key] for r in rows]))
+        ).all()
+    }
+    missing = [r for r in rows if r[key] not in stored]
+    if missing:
+        session.execute(insert(model), missing)
+    for r in rows:
+        current = stored.get(r[key])
+        if current is None:
+            continue
+        changed = {
+            c: r[c] for c, value in zip(update_columns, current) if value != r[c]
+        }
+        if changed:
+            session.execute(update(model).where(key_column == r[key]).values(**changed))
+
+
+def persist_books_and_chapters(
+    enriched_books,
+    session,
+    update_text: bool = False,
+    batch_size: int = UPSERT_BATCH_SIZE,
+):
     """
-    Persist books and chapters into database.
+    Upsert books and chapters into database with batched
+    INSERT ... ON CONFLICT statements (select-then-insert on backends
+    without ON CONFLICT).
+    Existing rows are kept as-is, unless update_text=True: then chapters whose
+    chapter_text (or title) changed are updated, and book sizes refreshed.
     Assumes enriched_books structure:
     {
         "book_id": str,
         "chapters": [...]
     }
     """
+    dialect_insert = _dialect_insert(session)
+    now = datetime.now(timezone.utc)
 
-    for book in enriched_books:
-        book_id = book["book_id"]
-        chapters = book["chapters"]
-        existing = session.get(Book, book_id)
-        if not existing:
-            # 1️⃣ persist Book
-            session.add(Book(id=book_id, title=book_id, size=len(chapters)))
-
-        # 2️⃣ persist Chapters
-        for ch in book["chapters"]:
-            if not session.get(Chapter, ch["id"]):
-                session.add(
-                    Chapter(
-                        id=ch["id"],
-                        book_id=book_id,
-                        title=ch.get("title"),
-                        chapter_text=ch["chapter_text"],
-                    )
+    book_rows = [
+        {
+            "id": book["book_id"],
+            "title": book["book_id"],
+            "size": len(book["chapters"]),
+            "created_at": now,
+        }
+        for book in enriched_books
+    ]
+    chapter_rows = [
+        {
+            "id": ch["id"],
+            "book_id": book["book_id"],
+            "title": ch.get("title"),
+            "chapter_text": ch["chapter_text"],
+            "created_at": now,
+        }
+        for book in enriched_books
+        for ch in book["chapters"]
+    ]
+
+    if dialect_insert is None:
+        for model, rows, update_columns in (
+            (Book, book_rows, ("size",)),
+            (Chapter, chapter_rows, ("chapter_text", "title")),
+        ):
+            for chunk in _iter_chunks(rows, batch_size):
+                _insert_missing(
+                    session,
+                    model,
+                    chunk,
+                    update_columns=update_columns if update_text else (),
                 )
+        session.commit()
+        return
+
+    for rows in _iter_chunks(book_rows, batch_size):
+        stmt = dialect_insert(Book).values(rows)
+        if update_text:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["id"], set_={"size": stmt.excluded.size}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
+        session.execute(stmt)
+
+    chapter_table = Chapter.__table__
+    for rows in _iter_chunks(chapter_rows, batch_size):
+        stmt = dialect_insert(Chapter).values(rows)
+        if update_text:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "chapter_text": stmt.excluded.chapter_text,
+                    "title": stmt.excluded.title,
+                },
+                where=chapter_table.c.chapter_text.is_distinct_from(
+                    stmt.excluded.chapter_text
+                )
+                | chapter_table.c.title.is_distinct_from(stmt.excluded.title),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
+        session.execute(stmt)
 
     session.commit()
 
 
-def persist_edges(edges, run_id: int, session):
-    for e in edges:
-        session.add(
-            Edge(
-                run_id=run_id,
-                from_chapter=e["from"],
-                to_chapter=e["to"],
-                score=e["score"],
-                type=e["type"],
+def _iter_chunks(items, chunk_size):
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_edges(session, rows, model=Edge, columns=EDGE_COLUMNS):
+    """COPY one chunk of edge rows through the session's psycopg2 connection."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[col] for col in columns])
+    buffer.seek(0)
+
+    table = model.__table__.name
+    raw_connection = session.connection().connection
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def get_chapter_keys(session, chapter_ids, known: dict = None) -> dict:
+    """
+    Integer keys of chapter_ids, assigning new ones where missing.
+    known: chapter_id -> key already looked up; filled in place.
+    Return:
+        dict[chapter_id] -> key
+    """
+    known = {} if known is None else known
+    missing = sorted(set(chapter_ids) - known.keys())
+    if missing:
+        dialect_insert = _dialect_insert(session)
+        for ids in _iter_chunks(missing, UPSERT_BATCH_SIZE):
+            rows = [{"chapter_id": cid} for cid in ids]
+            if dialect_insert is None:
+                _insert_missing(session, ChapterKey, rows, key="chapter_id")
+            else:
+                session.execute(
+                    dialect_insert(ChapterKey)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["chapter_id"])
+                )
+            known.update(
+                session.execute(
+                    select(ChapterKey.chapter_id, ChapterKey.id).where(
+                        ChapterKey.chapter_id.in_(ids)
+                    )
+                ).all()
             )
+    return known
+
+
+def persist_edges(
+    edges,
+    run_id: int,
+    session,
+    chunk_size: int = EDGE_CHUNK_SIZE,
+    storage: str = STORAGE_ROWS,
+    commit: bool = True,
+):
+    """
+    Bulk-write edges for a run.
+    PostgreSQL (psycopg2): one COPY ... FROM STDIN per chunk.
+    Other backends: batched executemany insert per chunk.
+    edges can be any iterable of {"from", "to", "score", "type"} dicts.
+    storage="compact" writes EdgeCompact rows (chapter keys, type codes).
+    commit=False leaves the transaction open, e.g. to mark the run finished
+    in the same commit.
+    Return:
+        {"rows": int, "seconds": float, "rows_per_sec": float}
+    """
+    bind = session.get_bind()
+    use_copy = bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"
+    created_at = datetime.now(timezone.utc)
+    if storage == STORAGE_COMPACT:
+        model, columns = EdgeCompact, COMPACT_EDGE_COLUMNS
+        keys = {}
+    else:
+        model, columns = Edge, EDGE_COLUMNS
+
+    started = time.perf_counter()
+    total = 0
+    for chunk in _iter_chunks(edges, chunk_size):
+        if storage == STORAGE_COMPACT:
+            get_chapter_keys(
+                session, chain.from_iterable((e["from"], e["to"]) for e in chunk), keys
+            )
+            rows = [
+                {
+                    "run_id": run_id,
+                    "from_key": keys[e["from"]],
+                    "to_key": keys[e["to"]],
+                    "score": e["score"],
+                    "type": EDGE_TYPE_CODES[e["type"]],
+                }
+                for e in chunk
+            ]
+        else:
+            rows = [
+                {
+                    "run_id": run_id,
+                    "from_chapter": e["from"],
+                    "to_chapter": e["to"],
+                    "score": e["score"],
+                    "type": e["type"],
+                    "created_at": created_at,
+                }
+                for e in chunk
+            ]
+        if use_copy:
+            _copy_edges(session, rows, model, columns)
+        else:
+            session.execute(insert(model), rows)
+        total += len(rows)
+    if commit:
+        session.commit()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": total,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(total / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def set_run_state(
+    session, run_id: int, state: str, error: str = None, finished: bool = False
+):
+    """
+    Persist a run's state; finished stamps finished_at (first time only).
+    Not committed.
+    """
+    values = {"state": state, "error": error}
+    if finished:
+        values["finished_at"] = func.coalesce(
+            Run.finished_at, datetime.now(timezone.utc)
         )
-    session.commit()
+    session.execute(update(Run).where(Run.id == run_id).values(**values))
+
+
+def persist_run_chapters(
+    session, run_id: int, chapter_shas: dict, batch_size: int = UPSERT_BATCH_SIZE
+):
+    """
+    Snapshot the text sha of every chapter run_id is computed on.
+    chapter_shas: dict[chapter_id] -> text sha. Not committed.
+    """
+    rows = [
+        {"run_id": run_id, "chapter_id": cid, "text_sha": sha}
+        for cid, sha in chapter_shas.items()
+    ]
+    for chunk in _iter_chunks(rows, batch_size):
+        session.execute(insert(RunChapter), chunk)
+
+
+def load_run_chapter_shas(session, run_id: int) -> dict:
+    """
+    Return:
+        dict[chapter_id] -> text sha the run was computed on ({} for runs
+        stored before snapshots)
+    """
+    rows = session.execute(
+        select(RunChapter.chapter_id, RunChapter.text_sha).where(
+            RunChapter.run_id == run_id
+        )
+    ).all()
+    return {cid: sha for cid, sha in rows}
+
+
+def load_chapter_texts(session, book_ids) -> dict:
+    """
+    Return:
+        dict[chapter_id] -> chapter_text as currently stored
+    """
+    rows = session.execute(
+        select(Chapter.id, Chapter.chapter_text)
+        .where(Chapter.book_id.in_(book_ids))
+        .order_by(Chapter.id)
+    ).all()
+    return {cid: text for cid, text in rows}
+
+
+def copy_run_edges(
+    session,
+    parent_run_id: int,
+    run_id: int,
+    chapter_ids,
+    min_score: float = None,
+    storage: str = STORAGE_ROWS,
+) -> int:
+    """
+    Copy the parent run's edges whose both endpoints are in chapter_ids into
+    run_id, server-side (INSERT ... SELECT). Both runs use the same storage.
+    Not committed.
+    Return:
+        copied row count
+    """
+    chapter_ids = list(chapter_ids)
+    if not chapter_ids:
+        return 0
+
+    if storage == STORAGE_COMPACT:
+        keys = select(ChapterKey.id).where(ChapterKey.chapter_id.in_(chapter_ids))
+        query = select(
+            literal(run_id),
+            EdgeCompact.from_key,
+            EdgeCompact.to_key,
+            EdgeCompact.score,
+            EdgeCompact.type,
+        ).where(
+            EdgeCompact.run_id == parent_run_id,
+            EdgeCompact.from_key.in_(keys),
+            EdgeCompact.to_key.in_(keys),
+        )
+        if min_score is not None:
+            query = query.where(EdgeCompact.score >= min_score)
+        result = session.execute(
+            insert(EdgeCompact).from_select(list(COMPACT_EDGE_COLUMNS), query)
+        )
+        return result.rowcount
+
+    created_at = datetime.now(timezone.utc)
+    query = select(
+        literal(run_id),
+        Edge.from_chapter,
+        Edge.to_chapter,
+        Edge.score,
+        Edge.type,
+        literal(created_at),
+    ).where(
+        Edge.run_id == parent_run_id,
+        Edge.from_chapter.in_(chapter_ids),
+        Edge.to_chapter.in_(chapter_ids),
+    )
+    if min_score is not None:
+        query = query.where(Edge.score >= min_score)
+
+    result = session.execute(insert(Edge).from_select(list(EDGE_COLUMNS), query))
+    return result.rowcount
+
+
+def run_edges_query(
+    run: Run,
+    min_score: float = None,
+    book_ids=None,
+    after: int = None,
+    limit: int = None,
+):
+    """
+    SELECT of a run's edges as (cursor, from_chapter, to_chapter, score, type)
+    rows, whichever storage the run uses.
+    book_ids: keep edges with both ends in these books.
+    after / limit: keyset paging, ordered by cursor (the edge id, in both
+    storages).
+    """
+    if run.storage != STORAGE_COMPACT:
+        query = select(
+            Edge.id, Edge.from_chapter, Edge.to_chapter, Edge.score, Edge.type
+        ).where(Edge.run_id == run.id)
+        if min_score is not None:
+            query = query.where(Edge.score >= min_score)
+        if book_ids is not None:
+            chapter_ids = select(Chapter.id).where(Chapter.book_id.in_(book_ids))
+            query = query.where(
+                Edge.from_chapter.in_(chapter_ids), Edge.to_chapter.in_(chapter_ids)
+            )
+        if after is not None:
+            query = query.where(Edge.id > after)
+        if limit is not None:
+            query = query.order_by(Edge.id).limit(limit)
+        return query
+
+    from_key, to_key = aliased(ChapterKey), aliased(ChapterKey)
+    query = (
+        select(
+            EdgeCompact.id,
+            from_key.chapter_id,
+            to_key.chapter_id,
+            EdgeCompact.score,
+            case(EDGE_TYPE_NAMES, value=EdgeCompact.type),
+        )
+        .join(from_key, from_key.id == EdgeCompact.from_key)
+        .join(to_key, to_key.id == EdgeCompact.to_key)
+        .where(EdgeCompact.run_id == run.id)
+    )
+    if min_score is not None:
+        query = query.where(EdgeCompact.score >= min_score)
+    if book_ids is not None:
+        keys = (
+            select(ChapterKey.id)
+            .join(Chapter, Chapter.id == ChapterKey.chapter_id)
+            .where(Chapter.book_id.in_(book_ids))
+        )
+        query = query.where(
+            EdgeCompact.from_key.in_(keys), EdgeCompact.to_key.in_(keys)
+        )
+    if after is not None:
+        query = query.where(EdgeCompact.id > after)
+    if limit is not None:
+        query = query.order_by(EdgeCompact.id).limit(limit)
+    return query
+
+
+def book_edges_queries(book_id: str):
+    """
+    SELECTs of the edges whose from_chapter belongs to book_id, over all
+    runs: one for edge rows (Edge entities), one for compact edges (rows for
+    compact_edge).
+    """
+    rows_query = (
+        select(Edge)
+        .join(Chapter, Edge.from_chapter == Chapter.id)
+        .where(Chapter.book_id == book_id)
+    )
+
+    from_key, to_key = aliased(ChapterKey), aliased(ChapterKey)
+    compact_query = (
+        select(
+            EdgeCompact.id,
+            EdgeCompact.run_id,
+            from_key.chapter_id,
+            to_key.chapter_id,
+            EdgeCompact.score,
+            EdgeCompact.type,
+            Run.created_at,
+        )
+        .join(from_key, from_key.id == EdgeCompact.from_key)
+        .join(to_key, to_key.id == EdgeCompact.to_key)
+        .join(Chapter, Chapter.id == from_key.chapter_id)
+        .join(Run, Run.id == EdgeCompact.run_id)
+        .where(Chapter.book_id == book_id)
+    )
+    return rows_query, compact_query
+
+
+def compact_edge(row) -> Edge:
+    """Transient Edge (created_at of its run) of a compact edge row."""
+    edge_id, run_id, source, target, score, code, created_at = row
+    return Edge(
+        id=edge_id,
+        run_id=run_id,
+        from_chapter=source,
+        to_chapter=target,
+        score=score,
+        type=EDGE_TYPE_NAMES[code],
+        created_at=created_at,
+    )
+
+
+def load_book_edges(session, book_id: str) -> list:
+    """
+    Edges whose from_chapter belongs to book_id, over all runs and both
+    storages (see book_edges_queries).
+    """
+    rows_query, compact_query = book_edges_queries(book_id)
+    edges = list(session.execute(rows_query).scalars())
+    edges.extend(compact_edge(row) for row in session.execute(compact_query))
+    return edges
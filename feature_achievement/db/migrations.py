@@ -0,0 +1,155 @@
+from sqlalchemy import text
+
+# Covering indexes for run-scoped edge reads (see Edge.__table_args__):
+#   /graph            WHERE run_id = ? [AND id > ?] ORDER BY id
+#   per-chapter reads WHERE run_id = ? AND from_chapter ...
+#   /edges?book_id=   JOIN chapter ON edge.from_chapter = chapter.id
+EDGE_INDEXES = {
+    "ix_edge_run_id_cover": (
+        "CREATE INDEX IF NOT EXISTS ix_edge_run_id_cover ON edge (run_id, id) "
+        "INCLUDE (from_chapter, to_chapter, score, type)"
+    ),
+    "ix_edge_run_from_cover": (
+        "CREATE INDEX IF NOT EXISTS ix_edge_run_from_cover "
+        "ON edge (run_id, from_chapter) INCLUDE (to_chapter, score, type)"
+    ),
+    "ix_edge_from_chapter_cover": (
+        "CREATE INDEX IF NOT EXISTS ix_edge_from_chapter_cover ON edge (from_chapter) "
+        "INCLUDE (id, run_id, to_chapter, score, type, created_at)"
+    ),
+}
+
+# Idempotent schema changes for databases created by an older init_db.
+# create_all() only creates missing tables, it never alters existing ones.
+MIGRATIONS = [
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS parent_run_id INTEGER",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS embedding_model VARCHAR",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS tfidf_hash_features INTEGER",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS storage VARCHAR NOT NULL DEFAULT 'rows'",
+    # runs stored before state tracking are complete
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS state VARCHAR NOT NULL DEFAULT 'succeeded'",
+    "ALTER TABLE run ALTER COLUMN state DROP DEFAULT",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS error VARCHAR",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS worker VARCHAR",
+    "ALTER TABLE run ADD COLUMN IF NOT EXISTS finished_at TIMESTAMP WITH TIME ZONE",
+    # edgecompact keyed (run_id, from_key, to_key) with float4 scores, before
+    # compact edges got ids
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'edgecompact' AND column_name = 'id'
+        ) THEN
+            ALTER TABLE edgecompact DROP CONSTRAINT edgecompact_pkey;
+            ALTER TABLE edgecompact
+                ADD COLUMN id INTEGER NOT NULL DEFAULT nextval('edge_id_seq');
+            ALTER TABLE edgecompact ADD PRIMARY KEY (id);
+            ALTER TABLE edgecompact ALTER COLUMN score TYPE DOUBLE PRECISION;
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_edgecompact_run_id ON edgecompact (run_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_edgecompact_from_key ON edgecompact (from_key)",
+    # compact and row edges share one id space: ids in /edges are unique
+    "ALTER TABLE edgecompact ALTER COLUMN id SET DEFAULT nextval('edge_id_seq')",
+    *EDGE_INDEXES.values(),
+    # superseded by the covering indexes
+    "DROP INDEX IF EXISTS ix_edge_run_id",
+    "DROP INDEX IF EXISTS ix_edge_from_chapter",
+]
+
+
+def apply_migrations(engine):
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for stmt in MIGRATIONS:
+            conn.execute(text(stmt))
+
+
+# ---------- optional: edge table list-partitioned by run_id ----------
+
+
+def edges_partitioned(conn) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'edge'"
+            )
+        ).scalar()
+    )
+
+
+def _create_run_partition(conn, run_id: int):
+    run_id = int(run_id)
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS edge_run_{run_id} "
+            f"PARTITION OF edge FOR VALUES IN ({run_id})"
+        )
+    )
+
+
+def partition_edges_by_run(engine):
+    """
+    Rebuild edge as a table list-partitioned by run_id: one partition per
+    run, plus edge_default for rows of runs without one. A run's reads then
+    touch only its own partition, and a run can be dropped with DROP TABLE.
+    Copies every edge once; run it in a maintenance window. No-op when
+    already partitioned.
+    """
+    if engine.dialect.name != "postgresql":
+        raise NotImplementedError("edge partitioning needs PostgreSQL")
+
+    with engine.begin() as conn:
+        if edges_partitioned(conn):
+            return
+
+        conn.execute(text("ALTER TABLE edge RENAME TO edge_unpartitioned"))
+        # frees the name for the new table's primary key
+        conn.execute(text("ALTER INDEX edge_pkey RENAME TO edge_unpartitioned_pkey"))
+        # keep the id sequence alive when the old table is dropped
+        conn.execute(text("ALTER SEQUENCE edge_id_seq OWNED BY NONE"))
+        conn.execute(
+            text(
+                "CREATE TABLE edge (LIKE edge_unpartitioned INCLUDING DEFAULTS) "
+                "PARTITION BY LIST (run_id)"
+            )
+        )
+        # the partition key has to be part of the primary key
+        conn.execute(text("ALTER TABLE edge ADD PRIMARY KEY (run_id, id)"))
+        conn.execute(text("CREATE TABLE edge_default PARTITION OF edge DEFAULT"))
+
+        run_ids = (
+            conn.execute(text("SELECT DISTINCT run_id FROM edge_unpartitioned"))
+            .scalars()
+            .all()
+        )
+        for run_id in run_ids:
+            _create_run_partition(conn, run_id)
+
+        conn.execute(text("INSERT INTO edge SELECT * FROM edge_unpartitioned"))
+        conn.execute(text("DROP TABLE edge_unpartitioned"))
+        conn.execute(text("ALTER SEQUENCE edge_id_seq OWNED BY edge.id"))
+        for stmt in EDGE_INDEXES.values():
+            conn.execute(text(stmt))
+        conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_edge_to_chapter ON edge (to_chapter)")
+        )
+        conn.execute(text("ANALYZE edge"))
+
+
+def ensure_edge_partition(engine, run_id: int):
+    """
+    Create run_id's partition (if edge is partitioned) in a short transaction
+    of its own, before any of the run's work: CREATE TABLE ... PARTITION OF
+    locks edge exclusively, and other readers must not queue behind a run's
+    whole edge generation. Call it before the run's session touches edge,
+    or it waits on that session's own lock.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        if edges_partitioned(conn):
+            _create_run_partition(conn, run_id)
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from typing import Optional
 
+from sqlalchemy import Column, Index, SmallInteger
 from sqlmodel import SQLModel, Field
 
 
@@ -20,11 +21,41 @@ class Chapter(SQLModel, table=True):
 
 
 class Edge(SQLModel, table=True):
+    # run-scoped reads (/graph, neighbour index) are served by index-only
+    # scans; both run indexes lead with run_id, so no separate run_id index
+    __table_args__ = (
+        Index(
+            "ix_edge_run_id_cover",
+            "run_id",
+            "id",
+            postgresql_include=["from_chapter", "to_chapter", "score", "type"],
+        ),
+        Index(
+            "ix_edge_run_from_cover",
+            "run_id",
+            "from_chapter",
+            postgresql_include=["to_chapter", "score", "type"],
+        ),
+        # /edges?book_id=: chapters of the book joined on from_chapter
+        Index(
+            "ix_edge_from_chapter_cover",
+            "from_chapter",
+            postgresql_include=[
+                "id",
+                "run_id",
+                "to_chapter",
+                "score",
+                "type",
+                "created_at",
+            ],
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
-    run_id: int = Field(index=True)
+    run_id: int
 
-    from_chapter: str = Field(index=True)
+    from_chapter: str
     to_chapter: str = Field(index=True)
     score: float
     type: str  # tfidf / embedding / etc
@@ -32,6 +63,39 @@ class Edge(SQLModel, table=True):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class ChapterKey(SQLModel, table=True):
+    # integer surrogate key per chapter id, used by compact edge storage
+    id: Optional[int] = Field(default=None, primary_key=True)
+    chapter_id: str = Field(unique=True)
+
+
+class EdgeCompact(SQLModel, table=True):
+    # compact edge layout: chapter keys instead of ids, type code
+    # (crud.EDGE_TYPE_CODES); the creation time is the run's. On PostgreSQL
+    # ids come from edge_id_seq (see migrations), so they never collide
+    # with edge ids and page like them
+    __table_args__ = (
+        Index("ix_edgecompact_run_id", "run_id", "id"),
+        # /edges?book_id=
+        Index("ix_edgecompact_from_key", "from_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int
+    from_key: int
+    to_key: int
+    score: float
+    type: int = Field(sa_column=Column(SmallInteger, nullable=False))
+
+
+class RunChapter(SQLModel, table=True):
+    # text sha of every chapter a run was computed on; incremental runs diff
+    # against this instead of the (since overwritten) chapter_text
+    run_id: int = Field(primary_key=True)
+    chapter_id: str = Field(primary_key=True)
+    text_sha: str
+
+
 class Run(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     # 输入
@@ -43,5 +107,19 @@ class Run(SQLModel, table=True):
     similarity: str
     min_store: float
     top_k: Optional[int] = None
+    embedding_model: Optional[str] = None  # set when the run used embeddings
+    # hashed TF-IDF buckets, None for a fitted vocabulary (or no TF-IDF)
+    tfidf_hash_features: Optional[int] = None
+    # where the edges live: "rows" (edge) | "compact" (edgecompact)
+    storage: str = "rows"
+    # 增量计算: the run this one was derived from
+    parent_run_id: Optional[int] = None
+
+    # 运行状态: queued | running | succeeded | failed | cancelled; succeeded is
+    # committed together with the run's last edges
+    state: str = "queued"
+    error: Optional[str] = None
+    worker: Optional[str] = None  # "host:pid" of the process executing the run
+    finished_at: Optional[datetime] = None
 
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,9 +1,20 @@
-from feature_achievement.ingestion import convert_content_to_json, dump_data_to_json
+import os
+
+from feature_achievement.ingestion import convert_content_to_json, dump_books_to_jsonl
+from feature_achievement.model_registry import get_model
+from feature_achievement.retrieval.edge_generation import _pool_context
 import yaml
-import spacy
 
 
-nlp = spacy.load("en_core_web_sm")
+SPACY_MODEL = "en_core_web_sm"
+INGEST_WORKERS = int(os.environ.get("CHAPTERGRAPH_INGEST_WORKERS", 1))
+
+
+def __getattr__(name):
+    # `nlp` used to be loaded at import; it is now loaded on first access
+    if name == "nlp":
+        return get_model("spacy", SPACY_MODEL)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def enrich_chapter_text(data: dict) -> dict:
@@ -22,16 +33,34 @@ def load_enriched_data(book_name, content_path):
     return enriched_data
 
 
-def load_all_enriched_data(config_path):
+def _load_book(cfg):
+    return load_enriched_data(
+        book_name=cfg["book_name"], content_path=cfg["content_path"]
+    )
+
+
+def load_all_enriched_data(config_path, workers: int = INGEST_WORKERS, dump_path=None):
+    """
+    Parse every book listed in config_path, in config order.
+    workers > 1 parses the books on a process pool.
+    dump_path: also write the books there as JSON Lines (nothing is written
+    otherwise).
+    """
     with open(config_path, "r") as f:
         book_configs = yaml.safe_load(f)
-    enriched_books = []
-
-    for cfg in book_configs:
-        enriched = load_enriched_data(
-            book_name=cfg["book_name"], content_path=cfg["content_path"]
-        )
-        dump_data_to_json(enriched)
-        enriched_books.append(enriched)
+
+    if workers > 1 and len(book_configs) > 1:
+        # called from API job threads too: no fork there
+        with _pool_context().Pool(processes=min(workers, len(book_configs))) as pool:
+            enriched_books = pool.map(
+                _load_book,
+                book_configs,
+                chunksize=max(1, len(book_configs) // (4 * workers)),
+            )
+    else:
+        enriched_books = [_load_book(cfg) for cfg in book_configs]
+
+    if dump_path:
+        dump_books_to_jsonl(enriched_books, dump_path)
 
     return enriched_books
@@ -125,15 +125,16 @@ def create_bullet(chapter, tokens, current_bullet):
     return current_bullet
 
 
-def read_lines(path):
+def iter_lines(path):
+    """Stream a TOC file line by line instead of reading it whole."""
     with open(path, "r", encoding="utf-8") as f:
-        return f.readlines()
+        yield from f
 
 
 def load_content_to_data(content_path, book_name, rule=RULE):
     """turn path source text to data structure"""
     chapters = []
-    content_lines = read_lines(content_path)
+    content_lines = iter_lines(content_path)
 
     parser_meta = {
         "chapter_types": set(),
@@ -187,12 +188,16 @@ def load_data(book_name, chapters, parser_meta):
     return data
 
 
-def dump_data_to_json(data, output_dir="output"):
-    book_id = data["book_id"]
-    path = os.path.join(output_dir, f"{book_id}_enriched.json")
+def dump_books_to_jsonl(books, path=os.path.join("output", "enriched_books.jsonl")):
+    """One compact JSON document per book, one book per line."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
 
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+        for data in books:
+            f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
 
 
 def convert_content_to_json(book_name, content_path):
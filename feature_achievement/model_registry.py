@@ -0,0 +1,76 @@
+import os
+import threading
+
+# "kind:name" pairs loaded at API startup, comma separated, e.g.
+# "spacy:en_core_web_sm,sentence_transformers:all-MiniLM-L6-v2"
+PRELOAD_MODELS = os.environ.get("CHAPTERGRAPH_PRELOAD_MODELS", "")
+
+
+def _load_spacy(name: str):
+    import spacy
+
+    return spacy.load(name)
+
+
+def _load_sentence_transformer(name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name)
+
+
+LOADERS = {
+    "spacy": _load_spacy,
+    "sentence_transformers": _load_sentence_transformer,
+}
+
+_models = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(kind: str, name: str):
+    """
+    Load a model on first use and share it for the rest of the process.
+    The heavy library is only imported here, so importing the API stays cheap.
+    Concurrent first calls for the same model load it once.
+    """
+    key = (kind, name)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    if kind not in LOADERS:
+        raise ValueError(f"unknown model kind: {kind!r}")
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _models:
+            _models[key] = LOADERS[kind](name)
+        return _models[key]
+
+
+def loaded_models() -> list[str]:
+    return [f"{kind}:{name}" for kind, name in _models]
+
+
+def parse_model_specs(specs: str) -> list[tuple[str, str]]:
+    """
+    "spacy:en_core_web_sm,sentence_transformers:x" -> [(kind, name), ...]
+    """
+    pairs = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        kind, sep, name = spec.partition(":")
+        if not sep or not name:
+            raise ValueError(f"model spec must be kind:name, got {spec!r}")
+        pairs.append((kind, name))
+    return pairs
+
+
+def preload(specs: str = PRELOAD_MODELS):
+    """Load the configured models up front (API startup)."""
+    for kind, name in parse_model_specs(specs):
+        get_model(kind, name)
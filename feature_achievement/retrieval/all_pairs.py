@@ -0,0 +1,81 @@
+import numpy as np
+import scipy.sparse as sp
+
+# bytes held per (source, target) cell of a block: float64 score + mask,
+# rounded up for the sparse product's intermediates
+_BYTES_PER_CELL = 16
+
+
+def block_rows(n_chapters: int, memory_budget: int) -> int:
+    """Source rows per block so one block's score matrix fits memory_budget bytes."""
+    return max(1, memory_budget // (max(n_chapters, 1) * _BYTES_PER_CELL))
+
+
+def iter_all_pairs_edge_blocks(
+    matrix,
+    chapter_ids: list[str],
+    edge_type: str,
+    min_score: float = 0.1,
+    top_k: int = None,
+    memory_budget: int = 256 * 1024 * 1024,
+    progress_callback=None,
+):
+    """
+    Exact thresholded cross-book graph over every chapter pair, without
+    candidate generation.
+    matrix: L2-normalized rows, either the CSR tfidf_matrix (row-blocked
+    sparse product) or dense embeddings (row-blocked GEMM), aligned with
+    chapter_ids.
+    Each block scores block_rows(...) sources against all chapters; min_score,
+    same-book masking and top_k are applied inside the block, so only the
+    kept edges leave it. Edges have the shape persist_edges consumes, sources
+    in chapter_ids order and targets best first with top_k.
+    progress_callback(done, total) is called after each block.
+    """
+    n = len(chapter_ids)
+    sparse = sp.issparse(matrix)
+    if sparse:
+        matrix = matrix.tocsr()
+        matrix_t = matrix.T.tocsc()
+    else:
+        matrix = np.asarray(matrix)
+        matrix_t = matrix.T
+
+    # chapter ids are "{book_id}::{chapter}"
+    book_ids = np.array([cid.split("::")[0] for cid in chapter_ids])
+    _, book_codes = np.unique(book_ids, return_inverse=True)
+
+    step = block_rows(n, memory_budget)
+    for start in range(0, n, step):
+        end = min(start + step, n)
+        scores = matrix[start:end] @ matrix_t
+        scores = scores.toarray() if sparse else np.asarray(scores, dtype=np.float64)
+
+        scores[book_codes[start:end, None] == book_codes[None, :]] = -np.inf
+        keep = scores >= min_score
+
+        block_edges = []
+        for row in range(end - start):
+            cols = np.flatnonzero(keep[row])
+            row_scores = scores[row, cols]
+            if top_k is not None:
+                if len(cols) > top_k:
+                    part = np.argpartition(-row_scores, top_k - 1)[:top_k]
+                    cols, row_scores = cols[part], row_scores[part]
+                order = np.lexsort((cols, -row_scores))
+                cols, row_scores = cols[order], row_scores[order]
+
+            src_id = chapter_ids[start + row]
+            block_edges.extend(
+                {
+                    "from": src_id,
+                    "to": chapter_ids[j],
+                    "score": float(score),
+                    "type": edge_type,
+                }
+                for j, score in zip(cols, row_scores)
+            )
+
+        if progress_callback is not None:
+            progress_callback(end, n)
+        yield block_edges
@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+
+from .base import CandidateGenerator
+
+
+class IvfIndex:
+    """
+    In-process inverted-file (IVF) index over L2-normalized vectors, scored
+    by inner product (= cosine).
+    Vectors are bucketed by a spherical k-means coarse quantizer; a query
+    only scans the nprobe lists whose centroids are closest to it.
+
+        centroids     float32[n_lists, dim]
+        list_offsets  int64[n_lists + 1]   CSR-style offsets into list_ids
+        list_ids      int64[n]             vector ids grouped by list
+    """
+
+    def __init__(self, vectors, centroids, list_offsets, list_ids):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+
+    @classmethod
+    def build(cls, vectors, n_lists: int = None, n_iter: int = 10, seed: int = 0):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        n_lists = max(1, min(n_lists or int(np.sqrt(n)), n))
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = vectors[assign == c]
+                if len(members) == 0:
+                    # re-seed empty lists with a random vector
+                    centroids[c] = vectors[rng.integers(n)]
+                    continue
+                mean = members.sum(axis=0)
+                norm = np.linalg.norm(mean)
+                centroids[c] = mean / norm if norm > 0 else mean
+
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=n_lists), out=list_offsets[1:])
+        return cls(vectors, centroids, list_offsets, list_ids)
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            vectors=self.vectors,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(
+                data["vectors"],
+                data["centroids"],
+                data["list_offsets"],
+                data["list_ids"],
+            )
+
+    def _probe(self, query, nprobe: int):
+        """Candidate vector ids from the nprobe closest lists, with scores."""
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        ids = np.concatenate(
+            [
+                self.list_ids[self.list_offsets[c] : self.list_offsets[c + 1]]
+                for c in lists
+            ]
+        )
+        return ids, self.vectors[ids] @ query
+
+    def search(self, query, k: int, nprobe: int = 8):
+        """
+        Return:
+            (ids, scores) of the approximate top-k, best first
+        """
+        ids, scores = self._probe(np.asarray(query, dtype=np.float32), nprobe)
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+    def range_search(self, query, radius: float, nprobe: int = 8):
+        """
+        Return:
+            (ids, scores) of probed vectors with score >= radius, best first
+        """
+        ids, scores = self._probe(np.asarray(query, dtype=np.float32), nprobe)
+        keep = scores >= radius
+        ids, scores = ids[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+
+class EmbeddingAnnCandidateGenerator(CandidateGenerator):
+    """
+    Semantic candidates: approximate nearest chapters in embedding space,
+    excluding the source's own book.
+    top_k neighbours per chapter, or every neighbour within radius
+    (cosine >= radius) when radius is set.
+    The IVF index is loaded from / saved to index_path when given.
+    """
+
+    def __init__(
+        self,
+        embedding_index: dict,
+        top_k: int = 20,
+        radius: float = None,
+        nprobe: int = 8,
+        index_path: str = None,
+    ):
+        self.chapter_ids = embedding_index["chapter_ids"]
+        self.id_to_idx = {cid: i for i, cid in enumerate(self.chapter_ids)}
+        self.top_k = top_k
+        self.radius = radius
+        self.nprobe = nprobe
+
+        # chapter ids are "{book_id}::{chapter}"
+        book_ids = np.array([cid.split("::")[0] for cid in self.chapter_ids])
+        _, self.book_codes = np.unique(book_ids, return_inverse=True)
+        self.book_sizes = np.bincount(self.book_codes)
+
+        embeddings = embedding_index["embeddings"]
+        self.index = None
+        if index_path and os.path.exists(index_path):
+            index = IvfIndex.load(index_path)
+            if index.vectors.shape == embeddings.shape:
+                self.index = index
+        if self.index is None:
+            self.index = IvfIndex.build(embeddings)
+            if index_path:
+                self.index.save(index_path)
+
+    def generate(self, src_id: str) -> set[str]:
+        i = self.id_to_idx.get(src_id)
+        if i is None:
+            return set()
+
+        query = self.index.vectors[i]
+        if self.radius is not None:
+            ids, _ = self.index.range_search(query, self.radius, self.nprobe)
+        else:
+            # over-fetch by the own-book size, those are filtered out below
+            k = self.top_k + int(self.book_sizes[self.book_codes[i]])
+            ids, _ = self.index.search(query, k, self.nprobe)
+
+        ids = ids[self.book_codes[ids] != self.book_codes[i]]
+        if self.radius is None:
+            ids = ids[: self.top_k]
+        return {self.chapter_ids[j] for j in ids}
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+import numpy as np
+
+from .base import CandidateGenerator
+
+# hashes are (a * x + b) mod p with p = 2^31 - 1, so a * x fits in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_EMPTY = np.iinfo(np.uint64).max
+
+
+def minhash_signatures(tfidf_matrix, num_perm: int, seed: int = 0, chunk_hashes=2**22):
+    """
+    MinHash signature of every row's token/bigram set, i.e. the column ids of
+    its nonzeros in the CSR TF-IDF matrix.
+    Rows are hashed in chunks of about chunk_hashes / num_perm nonzeros (at
+    least one row), so the num_perm x nnz(chunk) uint64 hash block stays near
+    chunk_hashes * 8 bytes however long the chapters are.
+    Return:
+        uint64[n_rows, num_perm]; empty rows are all _EMPTY
+    """
+    tfidf_matrix = tfidf_matrix.tocsr()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+    n_rows = tfidf_matrix.shape[0]
+    signatures = np.full((n_rows, num_perm), _EMPTY, dtype=np.uint64)
+    indptr, indices = tfidf_matrix.indptr, tfidf_matrix.indices
+    chunk_nnz = max(1, chunk_hashes // num_perm)
+
+    start = 0
+    while start < n_rows:
+        # last row whose nonzeros still fit in the chunk, at least one row
+        end = int(np.searchsorted(indptr, indptr[start] + chunk_nnz, side="right")) - 1
+        end = min(max(end, start + 1), n_rows)
+        lo, hi = indptr[start], indptr[end]
+        if lo == hi:
+            start = end
+            continue
+        # num_perm x nnz(chunk), hashed in place
+        hashes = a * (indices[lo:hi].astype(np.uint64) % _PRIME)[None, :]
+        hashes += b
+        hashes %= _PRIME
+
+        offsets = indptr[start:end] - lo
+        nonempty = np.diff(indptr[start : end + 1]) > 0
+        mins = np.minimum.reduceat(hashes, offsets[nonempty], axis=1)
+        signatures[start:end][nonempty] = mins.T
+        start = end
+
+    return signatures
+
+
+class MinHashLshCandidateGenerator(CandidateGenerator):
+    """
+    Lexical candidates via MinHash + banded LSH over chapter token/bigram
+    sets. Chapters sharing any band bucket become candidates; the chance of
+    that is 1 - (1 - J^rows)^bands for Jaccard similarity J, so the
+    threshold is roughly (1 / bands) ^ (1 / rows).
+    Lookup cost per chapter is bands bucket reads, independent of how common
+    its tokens are.
+    """
+
+    def __init__(self, tfidf_index, bands: int = 32, rows: int = 2, seed: int = 0):
+        self.chapter_ids = tfidf_index["chapter_ids"]
+        self.id_to_idx = {cid: i for i, cid in enumerate(self.chapter_ids)}
+        self.bands = bands
+        self.rows = rows
+
+        # chapter ids are "{book_id}::{chapter}"
+        book_ids = np.array([cid.split("::")[0] for cid in self.chapter_ids])
+        _, self.book_codes = np.unique(book_ids, return_inverse=True)
+
+        self.signatures = minhash_signatures(
+            tfidf_index["tfidf_matrix"], num_perm=bands * rows, seed=seed
+        )
+        self.buckets = self._build_buckets()
+
+    def _band_keys(self, i: int):
+        sig = self.signatures[i]
+        return [
+            sig[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _build_buckets(self):
+        buckets = [defaultdict(list) for _ in range(self.bands)]
+        for i in range(len(self.chapter_ids)):
+            if self.signatures[i, 0] == _EMPTY:
+                continue
+            for band, key in enumerate(self._band_keys(i)):
+                buckets[band][key].append(i)
+        return buckets
+
+    def generate(self, src_id: str) -> set[str]:
+        i = self.id_to_idx.get(src_id)
+        if i is None or self.signatures[i, 0] == _EMPTY:
+            return set()
+
+        src_book = self.book_codes[i]
+        matches = set()
+        for band, key in enumerate(self._band_keys(i)):
+            matches.update(self.buckets[band].get(key, ()))
+
+        return {self.chapter_ids[j] for j in matches if self.book_codes[j] != src_book}
@@ -0,0 +1,65 @@
+import numpy as np
+from scipy import sparse
+
+from .base import CandidateGenerator
+
+
+def build_token_matrix(chapter_top_tokens):
+    """
+    Input:
+        chapter_top_tokens: dict[chapter_id] -> list[token]
+    Output:
+        (chapter_ids, binary CSR chapter x token matrix)
+    """
+    chapter_ids = list(chapter_top_tokens.keys())
+    vocabulary = {}
+    rows, cols = [], []
+
+    for row, cid in enumerate(chapter_ids):
+        for token in set(chapter_top_tokens[cid]):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(chapter_ids), len(vocabulary)),
+    )
+    return chapter_ids, matrix
+
+
+class SparseTokenCandidateGenerator(CandidateGenerator):
+    """
+    Shared-top-token candidates computed for the whole corpus at once:
+    overlap = M @ M.T counts shared tokens for every chapter pair, then the
+    min_shared_tokens threshold and the same-book mask are applied to the
+    sparse result.
+    """
+
+    def __init__(self, chapter_top_tokens, min_shared_tokens=2):
+        self.min_shared_tokens = min_shared_tokens
+        self.chapter_ids, self.token_matrix = build_token_matrix(chapter_top_tokens)
+        self.id_to_idx = {cid: i for i, cid in enumerate(self.chapter_ids)}
+        self.candidate_matrix = self._build_candidate_matrix()
+
+    def _build_candidate_matrix(self):
+        overlap = (self.token_matrix @ self.token_matrix.T).tocoo()
+
+        # chapter ids are "{book_id}::{chapter}"
+        book_ids = np.array([cid.split("::")[0] for cid in self.chapter_ids])
+        _, book_codes = np.unique(book_ids, return_inverse=True)
+
+        keep = (overlap.data >= self.min_shared_tokens) & (
+            book_codes[overlap.row] != book_codes[overlap.col]
+        )
+        return sparse.csr_matrix(
+            (overlap.data[keep], (overlap.row[keep], overlap.col[keep])),
+            shape=overlap.shape,
+        )
+
+    def generate(self, src_id: str) -> set[str]:
+        i = self.id_to_idx.get(src_id)
+        if i is None:
+            return set()
+
+        start, end = self.candidate_matrix.indptr[i : i + 2]
+        return {self.chapter_ids[j] for j in self.candidate_matrix.indices[start:end]}
@@ -1,9 +1,203 @@
-def generate_edges(enriched_books, retrieval_pipeline):
-    edges = []
+import heapq
+import multiprocessing as mp
+import threading
+from collections import deque
+from itertools import chain
 
-    for book in enriched_books:
-        for chapter in book["chapters"]:
-            src_id = chapter["id"]
-            edges.extend(retrieval_pipeline.retrieve(src_id))
+# set once per worker process by _init_worker
+_WORKER_PIPELINE = None
+_WORKER_DIRTY_IDS = None
 
-    return edges
+
+def _init_worker(retrieval_pipeline, dirty_ids=None):
+    global _WORKER_PIPELINE, _WORKER_DIRTY_IDS
+    _WORKER_PIPELINE = retrieval_pipeline
+    _WORKER_DIRTY_IDS = dirty_ids
+
+
+def _retrieve_shard(task):
+    src_ids, restricted = task
+    targets = _WORKER_DIRTY_IDS if restricted else None
+    return _WORKER_PIPELINE.retrieve_block(src_ids, targets=targets)
+
+
+def _pool_context():
+    """
+    fork shares the pipeline (CSR matrix, embeddings, token index) with the
+    workers copy-on-write, but forking a process with other threads running
+    (the API's worker threads, DB pool, ...) can copy a lock held by one of
+    them and deadlock the child. There, and where fork is unavailable
+    (Windows), forkserver or spawn pickle the pipeline once per worker,
+    never per task.
+    """
+    methods = mp.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return mp.get_context("fork")
+    if "forkserver" in methods:
+        return mp.get_context("forkserver")
+    return mp.get_context("spawn")
+
+
+def _bounded_imap(pool, fn, tasks, max_in_flight):
+    """
+    pool.imap(fn, tasks), with at most max_in_flight tasks submitted and not
+    yet consumed: imap queues every task up front and buffers finished ones,
+    so a slow consumer (the edge writer) would hold all results in memory.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) == max_in_flight:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(fn, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def _blocks(src_ids, block_size, restricted):
+    return [
+        (src_ids[start : start + block_size], restricted)
+        for start in range(0, len(src_ids), block_size)
+    ]
+
+
+def iter_edge_blocks(
+    enriched_books,
+    retrieval_pipeline,
+    block_size: int = 256,
+    progress_callback=None,
+    workers: int = 1,
+    dirty_ids=None,
+):
+    """
+    Yield the edges of each block of block_size source chapters, in order.
+    workers > 1 shards the blocks across a process pool, with at most
+    2 * workers blocks in flight; blocks are collected in order, so the
+    stream is identical to the serial one.
+    dirty_ids (incremental runs): only pairs touching these chapters are
+    scored — dirty sources against all candidates, clean sources against
+    dirty targets only.
+    progress_callback(done, total) is called after each block.
+    """
+    src_ids = [chapter["id"] for book in enriched_books for chapter in book["chapters"]]
+    if dirty_ids is None:
+        tasks = _blocks(src_ids, block_size, restricted=False)
+    else:
+        tasks = _blocks(
+            [cid for cid in src_ids if cid in dirty_ids], block_size, restricted=False
+        ) + _blocks(
+            [cid for cid in src_ids if cid not in dirty_ids],
+            block_size,
+            restricted=True,
+        )
+    done = 0
+
+    if workers > 1 and len(tasks) > 1:
+        processes = min(workers, len(tasks))
+        with _pool_context().Pool(
+            processes=processes,
+            initializer=_init_worker,
+            initargs=(retrieval_pipeline, dirty_ids),
+        ) as pool:
+            for (block, _), block_edges in zip(
+                tasks, _bounded_imap(pool, _retrieve_shard, tasks, 2 * processes)
+            ):
+                done += len(block)
+                if progress_callback is not None:
+                    progress_callback(done, len(src_ids))
+                yield block_edges
+        return
+
+    for block, restricted in tasks:
+        targets = dirty_ids if restricted else None
+        block_edges = retrieval_pipeline.retrieve_block(block, targets=targets)
+        done += len(block)
+        if progress_callback is not None:
+            progress_callback(done, len(src_ids))
+        yield block_edges
+
+
+def mutual_knn_filter(edge_blocks):
+    """
+    Keep an edge a -> b only if b -> a was produced as well (mutual kNN when
+    the pipeline has top_k). Needs every pair first, so the blocks are
+    materialized — with top_k that is n * k edges.
+    """
+    blocks = list(edge_blocks)
+    pairs = {(e["from"], e["to"]) for block in blocks for e in block}
+    for block in blocks:
+        yield [e for e in block if (e["to"], e["from"]) in pairs]
+
+
+def top_edges(edge_blocks, max_edges: int):
+    """
+    The max_edges highest-scoring edges of the stream (ties: earliest first),
+    in generation order. Keeps a max_edges heap, so the whole stream is
+    consumed before the first edge comes out.
+    """
+    heap = []
+    if max_edges <= 0:
+        return heap
+    seq = 0
+    for block_edges in edge_blocks:
+        for edge in block_edges:
+            # min-heap on (score, -seq): the root is the weakest, latest edge
+            item = (edge["score"], -seq, edge)
+            if len(heap) < max_edges:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+            seq += 1
+    heap.sort(key=lambda item: -item[1])
+    return [edge for _, _, edge in heap]
+
+
+def batch_edges(edge_blocks, batch_size: int = 5000, max_edges: int = None):
+    """
+    Re-chunk a stream of edge blocks into fixed-size batches (the last one
+    may be shorter). max_edges keeps only the max_edges strongest edges,
+    see top_edges.
+    """
+    if max_edges is not None:
+        edge_blocks = [top_edges(edge_blocks, max_edges)]
+    batch = []
+
+    for block_edges in edge_blocks:
+        for edge in block_edges:
+            batch.append(edge)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+    if batch:
+        yield batch
+
+
+def iter_edge_batches(
+    enriched_books,
+    retrieval_pipeline,
+    batch_size: int = 5000,
+    max_edges: int = None,
+    mutual: bool = False,
+    **kwargs,
+):
+    """
+    Stream edges in fixed-size batches, see batch_edges.
+    mutual: apply mutual_knn_filter.
+    kwargs are passed to iter_edge_blocks.
+    """
+    edge_blocks = iter_edge_blocks(enriched_books, retrieval_pipeline, **kwargs)
+    if mutual:
+        edge_blocks = mutual_knn_filter(edge_blocks)
+    return batch_edges(edge_blocks, batch_size=batch_size, max_edges=max_edges)
+
+
+def generate_edges(enriched_books, retrieval_pipeline, **kwargs):
+    """
+    Retrieve edges for every chapter into one list.
+    kwargs are passed to iter_edge_blocks.
+    """
+    return list(
+        chain.from_iterable(
+            iter_edge_blocks(enriched_books, retrieval_pipeline, **kwargs)
+        )
+    )
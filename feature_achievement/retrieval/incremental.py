@@ -0,0 +1,82 @@
+import numpy as np
+
+from feature_achievement.retrieval.utils.embedding_store import text_sha
+
+
+def diff_chapters(chapter_texts: dict, parent_shas: dict) -> set[str]:
+    """
+    Chapters that are new or whose text changed since the parent run.
+    Input:
+        chapter_texts: dict[chapter_id] -> text (the new corpus)
+        parent_shas: dict[chapter_id] -> text sha the parent run was computed on
+    Return:
+        set(chapter_id)
+    """
+    return {
+        cid
+        for cid, text in chapter_texts.items()
+        if parent_shas.get(cid) != text_sha(text)
+    }
+
+
+def parent_corpus(parent_shas: dict, stored_texts: dict):
+    """
+    The parent run's corpus rebuilt from the stored chapter texts, or None
+    when any of them has been overwritten since (sha no longer matches).
+    """
+    texts = {}
+    for cid, sha in parent_shas.items():
+        text = stored_texts.get(cid)
+        if text is None or text_sha(text) != sha:
+            return None
+        texts[cid] = text
+    return texts
+
+
+def idf_drift(old_vectorizer, new_vectorizer) -> float:
+    """
+    Largest relative IDF change over the vocabulary both vectorizers share.
+    Tokens that exist on only one side do not move shared-pair scores and are
+    ignored.
+    """
+    if hasattr(old_vectorizer, "df_") and hasattr(new_vectorizer, "df_"):
+        # hashed: compare the buckets both corpora use
+        shared = (old_vectorizer.df_ > 0) & (new_vectorizer.df_ > 0)
+        if not shared.any():
+            return float("inf")
+        old_idf = old_vectorizer.idf_[shared]
+        new_idf = new_vectorizer.idf_[shared]
+        return float(np.max(np.abs(new_idf - old_idf) / old_idf))
+
+    old_vocab = old_vectorizer.vocabulary_
+    new_vocab = new_vectorizer.vocabulary_
+    shared = [token for token in old_vocab if token in new_vocab]
+    if not shared:
+        return float("inf")
+
+    old_idf = old_vectorizer.idf_[[old_vocab[t] for t in shared]]
+    new_idf = new_vectorizer.idf_[[new_vocab[t] for t in shared]]
+    return float(np.max(np.abs(new_idf - old_idf) / old_idf))
+
+
+def vocabulary_coverage(vectorizer, texts) -> float:
+    """
+    Smallest share, over texts, of a text's tokens/bigrams that the fitted
+    vectorizer knows. Unknown terms are dropped by transform, which leaves
+    the known ones a larger share of the L2-normalized vector and inflates
+    cosine scores. Texts without any term count as fully covered.
+    """
+    if hasattr(vectorizer, "df_"):
+        # hashed: a term is known when its bucket was seen in the base corpus
+        analyzer = vectorizer._analyzer
+        known = lambda term: vectorizer.df_[vectorizer.bucket(term)] > 0  # noqa: E731
+    else:
+        analyzer = vectorizer.build_analyzer()
+        known = vectorizer.vocabulary_.__contains__
+
+    coverage = 1.0
+    for text in texts:
+        terms = analyzer(text or "")
+        if terms:
+            coverage = min(coverage, sum(map(known, terms)) / len(terms))
+    return coverage
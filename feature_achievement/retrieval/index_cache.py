@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from feature_achievement.retrieval.utils.tfidf import (
+    TFIDF_PARAMS,
+    build_tfidf_index,
+    extract_top_tfidf_token_ids,
+)
+from feature_achievement.retrieval.utils.hashed_tfidf import (
+    HashedTfidfVectorizer,
+    build_hashed_tfidf_index,
+)
+
+INDEX_CACHE_DIR = os.environ.get(
+    "CHAPTERGRAPH_INDEX_CACHE_DIR", os.path.join(".cache", "retrieval_index")
+)
+INDEX_CACHE_MAX_BYTES = int(
+    os.environ.get("CHAPTERGRAPH_INDEX_CACHE_MAX_BYTES", 2 * 1024**3)
+)
+
+
+def corpus_key(chapter_texts: dict, params: dict) -> str:
+    """
+    sha256 over (chapter_id, chapter_text) pairs + the build parameters.
+    Any edited chapter, added book or changed parameter gives a new key.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    for cid in chapter_texts:
+        h.update(cid.encode("utf-8"))
+        h.update(b"\0")
+        h.update((chapter_texts[cid] or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _atomic_write(path, write):
+    """write(tmp_path) then rename, so readers never see half-written files."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class RetrievalIndexCache:
+    """
+    On-disk cache of retrieval resources, one directory per corpus key:
+
+        <cache_dir>/<key>/
+            chapter_ids.json
+            vocabulary.json      fitted TfidfVectorizer vocabulary
+            idf.npy
+            hashing.json         hashed indexes instead: n_features, n_docs,
+            df.npy               sample tokens, document frequencies
+            tfidf_matrix.npz
+            top_tokens_<n>.json  chapter_id -> top-n token ids
+            embeddings_<model>.npy
+            ann_ivf_<model>.npz  ANN index over the embeddings
+
+    Entries are evicted least-recently-used first once the cache grows
+    beyond max_bytes.
+    """
+
+    def __init__(
+        self, cache_dir: str = INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def tfidf_key(self, chapter_texts: dict, n_features: int = None) -> str:
+        return corpus_key(chapter_texts, self._tfidf_params(n_features))
+
+    @staticmethod
+    def _tfidf_params(n_features: int = None) -> dict:
+        if n_features is None:
+            return {"tfidf": TFIDF_PARAMS}
+        return {"tfidf": TFIDF_PARAMS, "hashing": n_features}
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _touch(self, key: str):
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            os.utime(entry_dir)
+
+    # ---------- tfidf ----------
+
+    def load_tfidf_index(self, key: str):
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(
+                os.path.join(entry_dir, "chapter_ids.json"), encoding="utf-8"
+            ) as f:
+                chapter_ids = json.load(f)
+            tfidf_matrix = sparse.load_npz(os.path.join(entry_dir, "tfidf_matrix.npz"))
+            if os.path.exists(os.path.join(entry_dir, "hashing.json")):
+                vectorizer = self._load_hashed_vectorizer(entry_dir)
+            else:
+                with open(
+                    os.path.join(entry_dir, "vocabulary.json"), encoding="utf-8"
+                ) as f:
+                    vocabulary = json.load(f)
+                vectorizer = TfidfVectorizer(**TFIDF_PARAMS, vocabulary=vocabulary)
+                vectorizer.idf_ = np.load(os.path.join(entry_dir, "idf.npy"))
+        except FileNotFoundError:
+            return None
+
+        self._touch(key)
+
+        return {
+            "chapter_ids": chapter_ids,
+            "tfidf_matrix": tfidf_matrix.tocsr(),
+            "vectorizer": vectorizer,
+        }
+
+    @staticmethod
+    def _load_hashed_vectorizer(entry_dir: str) -> HashedTfidfVectorizer:
+        with open(os.path.join(entry_dir, "hashing.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectorizer = HashedTfidfVectorizer(n_features=meta["n_features"])
+        vectorizer.n_docs_ = meta["n_docs"]
+        vectorizer.bucket_tokens_ = {
+            int(bucket): token for bucket, token in meta["bucket_tokens"].items()
+        }
+        vectorizer.df_ = np.load(os.path.join(entry_dir, "df.npy"))
+        return vectorizer
+
+    def save_tfidf_index(self, key: str, tfidf_index):
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        vectorizer = tfidf_index["vectorizer"]
+
+        def dump_json(obj):
+            def write(path):
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+
+            return write
+
+        def dump_npy(arr):
+            def write(path):
+                with open(path, "wb") as f:
+                    np.save(f, arr)
+
+            return write
+
+        def dump_npz(matrix):
+            def write(path):
+                with open(path, "wb") as f:
+                    sparse.save_npz(f, matrix)
+
+            return write
+
+        # tfidf_matrix.npz is written last: its presence marks a complete entry
+        _atomic_write(
+            os.path.join(entry_dir, "chapter_ids.json"),
+            dump_json(list(tfidf_index["chapter_ids"])),
+        )
+        if isinstance(vectorizer, HashedTfidfVectorizer):
+            meta = {
+                "n_features": vectorizer.n_features,
+                "n_docs": vectorizer.n_docs_,
+                "bucket_tokens": vectorizer.bucket_tokens_,
+            }
+            _atomic_write(os.path.join(entry_dir, "hashing.json"), dump_json(meta))
+            _atomic_write(os.path.join(entry_dir, "df.npy"), dump_npy(vectorizer.df_))
+        else:
+            vocabulary = {token: int(i) for token, i in vectorizer.vocabulary_.items()}
+            _atomic_write(
+                os.path.join(entry_dir, "vocabulary.json"), dump_json(vocabulary)
+            )
+            _atomic_write(os.path.join(entry_dir, "idf.npy"), dump_npy(vectorizer.idf_))
+        _atomic_write(
+            os.path.join(entry_dir, "tfidf_matrix.npz"),
+            dump_npz(tfidf_index["tfidf_matrix"].tocsr()),
+        )
+        self.evict(keep=key)
+
+    def get_or_build_tfidf_index(self, chapter_texts: dict, n_features: int = None):
+        """
+        n_features: build a hashed index with that many buckets instead of
+        fitting a vocabulary.
+        Return:
+            (key, tfidf_index) — same tfidf_index shape as build_tfidf_index
+        """
+        key = self.tfidf_key(chapter_texts, n_features)
+        tfidf_index = self.load_tfidf_index(key)
+        if tfidf_index is None:
+            if n_features is None:
+                tfidf_index = build_tfidf_index(chapter_texts)
+            else:
+                tfidf_index = build_hashed_tfidf_index(chapter_texts, n_features)
+            self.save_tfidf_index(key, tfidf_index)
+        return key, tfidf_index
+
+    def get_or_build_fixed_vocabulary_index(
+        self, chapter_texts: dict, base_texts, n_features: int = None
+    ):
+        """
+        TF-IDF index of chapter_texts in the vocabulary/IDF fitted on
+        base_texts (no refit): vectors of unchanged chapters stay identical.
+        Return:
+            (key, tfidf_index)
+        """
+        base_key, base_index = self.get_or_build_tfidf_index(base_texts, n_features)
+        key = corpus_key(
+            chapter_texts,
+            {**self._tfidf_params(n_features), "fixed_vocabulary": base_key},
+        )
+        tfidf_index = self.load_tfidf_index(key)
+        if tfidf_index is None:
+            chapter_ids = list(chapter_texts.keys())
+            vectorizer = base_index["vectorizer"]
+            tfidf_index = {
+                "chapter_ids": chapter_ids,
+                "tfidf_matrix": vectorizer.transform(
+                    [chapter_texts[cid] or "" for cid in chapter_ids]
+                ).tocsr(),
+                "vectorizer": vectorizer,
+            }
+            self.save_tfidf_index(key, tfidf_index)
+        return key, tfidf_index
+
+    # ---------- top tokens ----------
+
+    def get_or_build_top_token_ids(self, key: str, tfidf_index, top_n=20):
+        """
+        Return:
+            dict[chapter_id] -> np.ndarray[int] token ids
+        """
+        path = os.path.join(self._entry_dir(key), f"top_tokens_{top_n}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+            self._touch(key)
+            return {cid: np.asarray(ids, dtype=np.int64) for cid, ids in cached.items()}
+
+        chapter_top_tokens = extract_top_tfidf_token_ids(tfidf_index, top_n=top_n)
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {cid: ids.tolist() for cid, ids in chapter_top_tokens.items()},
+                    f,
+                    separators=(",", ":"),
+                )
+
+        os.makedirs(self._entry_dir(key), exist_ok=True)
+        _atomic_write(path, write)
+        self.evict(keep=key)
+        return chapter_top_tokens
+
+    # ---------- embeddings ----------
+
+    def _embedding_entry(self, chapter_texts: dict, model_name: str):
+        key = corpus_key(chapter_texts, {"embedding_model": model_name})
+        model_tag = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        return key, self._entry_dir(key), model_tag
+
+    def ann_index_path(self, chapter_texts: dict, model_name: str) -> str:
+        """Where the ANN index over these embeddings is persisted."""
+        key, entry_dir, model_tag = self._embedding_entry(chapter_texts, model_name)
+        os.makedirs(entry_dir, exist_ok=True)
+        self._touch(key)
+        return os.path.join(entry_dir, f"ann_ivf_{model_tag}.npz")
+
+    def get_or_build_embedding_index(self, chapter_texts: dict, model_name: str):
+        key, entry_dir, model_tag = self._embedding_entry(chapter_texts, model_name)
+        path = os.path.join(entry_dir, f"embeddings_{model_tag}.npy")
+
+        if os.path.exists(path):
+            self._touch(key)
+            return {
+                "chapter_ids": list(chapter_texts.keys()),
+                "embeddings": np.load(path),
+                "model_name": model_name,
+            }
+
+        # sentence-transformers is optional, only import it on a cache miss
+        from feature_achievement.retrieval.utils.embedding import build_embedding_index
+        from feature_achievement.retrieval.utils.embedding_store import (
+            get_embedding_store,
+        )
+
+        # the chapter-level store only encodes chapters it has not seen yet
+        embedding_index = build_embedding_index(
+            chapter_texts,
+            model_name=model_name,
+            store=get_embedding_store(model_name),
+        )
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                np.save(f, embedding_index["embeddings"])
+
+        os.makedirs(entry_dir, exist_ok=True)
+        _atomic_write(path, write)
+        self.evict(keep=key)
+        return embedding_index
+
+    # ---------- eviction ----------
+
+    def evict(self, keep: str = None):
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, f))
+                for f in os.listdir(entry_dir)
+            )
+            entries.append((os.path.getmtime(entry_dir), name, size))
+            total += size
+
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= size
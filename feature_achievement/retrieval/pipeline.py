@@ -1,40 +1,101 @@
+import numpy as np
+
+
 class RetrievalPipeline:
     def __init__(
         self,
         candidate_generator,
         similarity_scorer,
         min_score: float = 0.1,
+        top_k: int = None,
     ):
+        """
+        top_k: keep only the k best-scoring targets per source (after
+        min_score), so output grows as n * k instead of n^2.
+        """
         self.candidate_generator = candidate_generator
         self.similarity_scorer = similarity_scorer
         self.min_score = min_score
+        self.top_k = top_k
 
     @staticmethod
     def get_book_id(chapter_id: str) -> str:
         """spring-in-action::ch1->{book_id}::{chapter_id}"""
         return chapter_id.split("::")[0]
 
-    def retrieve(self, src_id: str) -> list[dict]:
-        edges = []
+    def cross_book_candidates(self, src_id: str, targets=None) -> list[str]:
+        """
+        Candidates of src_id outside its own book, in a stable order.
+        targets: optional set of chapter ids to restrict candidates to.
+        """
         src_book = self.get_book_id(src_id)
-        candidates = self.candidate_generator.generate(src_id)
+        return sorted(
+            tgt_id
+            for tgt_id in self.candidate_generator.generate(src_id)
+            if self.get_book_id(tgt_id) != src_book
+            and (targets is None or tgt_id in targets)
+        )
 
-        for tgt_id in candidates:
-            tgt_book = self.get_book_id(tgt_id)
-            if src_book == tgt_book:
-                continue
+    def _build_edges(self, src_id: str, tgt_ids: list[str], scores) -> list[dict]:
+        scores = np.asarray(scores, dtype=np.float64)
+        keep = np.flatnonzero(scores >= self.min_score)
 
-            score = self.similarity_scorer.score(src_id, tgt_id)
-            if score < self.min_score:
-                continue
+        if self.top_k is not None:
+            if len(keep) > self.top_k:
+                keep = keep[
+                    np.argpartition(-scores[keep], self.top_k - 1)[: self.top_k]
+                ]
+            # best first; ties by target id (tgt_ids are sorted)
+            keep = keep[np.lexsort((keep, -scores[keep]))]
 
-            edges.append(
-                {
-                    "from": src_id,
-                    "to": tgt_id,
-                    "score": score,
-                    "type":self.similarity_scorer.name,
-                }
-            )
+        return [
+            {
+                "from": src_id,
+                "to": tgt_ids[j],
+                "score": float(scores[j]),
+                "type": self.similarity_scorer.name,
+            }
+            for j in keep
+        ]
+
+    def retrieve(self, src_id: str) -> list[dict]:
+        tgt_ids = self.cross_book_candidates(src_id)
+        if not tgt_ids:
+            return []
+
+        scores = self.similarity_scorer.score_batch(src_id, tgt_ids)
+        return self._build_edges(src_id, tgt_ids, scores)
+
+    def retrieve_block(self, src_ids: list[str], targets=None) -> list[dict]:
+        """
+        Retrieve edges for a block of sources with one score_block() call
+        over the union of their candidates.
+        targets: optional set of chapter ids to restrict candidates to.
+        """
+        candidates = {
+            src_id: self.cross_book_candidates(src_id, targets) for src_id in src_ids
+        }
+        tgt_ids = sorted(set().union(*candidates.values()))
+        if not tgt_ids:
+            return []
+
+        col = {tgt_id: j for j, tgt_id in enumerate(tgt_ids)}
+        block = self.similarity_scorer.score_block(src_ids, tgt_ids)
+
+        edges = []
+        for row, src_id in enumerate(src_ids):
+            src_tgts = candidates[src_id]
+            if not src_tgts:
+                continue
+            scores = block[row, [col[tgt_id] for tgt_id in src_tgts]]
+            edges.extend(self._build_edges(src_id, src_tgts, scores))
 
         return edges
+
+    def iter_edges(self, src_ids: list[str], block_size: int = 256):
+        """
+        Streaming retrieve: yield the edges of each block of block_size
+        sources, so callers never hold more than one block in memory.
+        """
+        for start in range(0, len(src_ids), block_size):
+            yield self.retrieve_block(src_ids[start : start + block_size])
@@ -1,11 +1,35 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 
 class SimilarityScorer(ABC):
     @abstractmethod
     def score(self, src_id: str, tgt_id: str) -> float:
         pass
 
+    def score_batch(self, src_id: str, tgt_ids: list[str]) -> np.ndarray:
+        """
+        Score one source against many targets.
+        Return:
+            np.ndarray[len(tgt_ids)], aligned with tgt_ids
+        Default falls back to per-pair score(); vectorized scorers override it.
+        """
+        return np.array(
+            [self.score(src_id, tgt_id) for tgt_id in tgt_ids], dtype=np.float64
+        )
+
+    def score_block(self, src_ids: list[str], tgt_ids: list[str]) -> np.ndarray:
+        """
+        Score a block of sources against a shared list of targets.
+        Return:
+            np.ndarray[len(src_ids), len(tgt_ids)]
+        """
+        scores = np.zeros((len(src_ids), len(tgt_ids)), dtype=np.float64)
+        for row, src_id in enumerate(src_ids):
+            scores[row] = self.score_batch(src_id, tgt_ids)
+        return scores
+
     @property
     def name(self) -> str:
         raise NotImplementedError
@@ -9,6 +9,12 @@ class EmbeddingSimilarityScorer(SimilarityScorer):
         self.id_to_idx = {cid: i for i, cid in enumerate(self.chapter_ids)}
         self.model_name = embedding_index.get("model_name", "embedding")
 
+    def _indices(self, chapter_ids):
+        """Map ids to embedding rows; unknown ids map to -1."""
+        return np.array(
+            [self.id_to_idx.get(cid, -1) for cid in chapter_ids], dtype=np.int64
+        )
+
     def score(self, src_id: str, tgt_id: str) -> float:
         i = self.id_to_idx.get(src_id)
         j = self.id_to_idx.get(tgt_id)
@@ -16,6 +22,23 @@ class EmbeddingSimilarityScorer(SimilarityScorer):
             return 0.0
         return float(np.dot(self.embeddings[i], self.embeddings[j]))
 
+    def score_batch(self, src_id: str, tgt_ids: list[str]) -> np.ndarray:
+        return self.score_block([src_id], tgt_ids)[0]
+
+    def score_block(self, src_ids: list[str], tgt_ids: list[str]) -> np.ndarray:
+        src_idx = self._indices(src_ids)
+        tgt_idx = self._indices(tgt_ids)
+        scores = np.zeros((len(src_ids), len(tgt_ids)), dtype=np.float64)
+
+        src_ok = src_idx >= 0
+        tgt_ok = tgt_idx >= 0
+        if not src_ok.any() or not tgt_ok.any():
+            return scores
+
+        block = self.embeddings[src_idx[src_ok]] @ self.embeddings[tgt_idx[tgt_ok]].T
+        scores[np.ix_(src_ok, tgt_ok)] = block
+        return scores
+
     @property
     def name(self) -> str:
         return "embedding"
@@ -1,19 +1,51 @@
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 from .base import SimilarityScorer
 
 
 class TfidfSimilarityScorer(SimilarityScorer):
+    """
+    Cosine similarity over the TF-IDF matrix.
+    TfidfVectorizer L2-normalizes every row, so cosine == dot product and a
+    whole batch is a single sparse matrix product.
+    """
+
     def __init__(self, tfidf_index):
         self.chapter_ids = tfidf_index["chapter_ids"]
-        self.tfidf_matrix = tfidf_index["tfidf_matrix"]
+        self.tfidf_matrix = tfidf_index["tfidf_matrix"].tocsr()
+        self.id_to_idx = {cid: i for i, cid in enumerate(self.chapter_ids)}
+
+    def _indices(self, chapter_ids):
+        """Map ids to matrix rows; unknown ids map to -1."""
+        return np.array(
+            [self.id_to_idx.get(cid, -1) for cid in chapter_ids], dtype=np.int64
+        )
 
     def score(self, src_id: str, tgt_id: str) -> float:
-        i = self.chapter_ids.index(src_id)
-        j = self.chapter_ids.index(tgt_id)
+        i = self.id_to_idx.get(src_id)
+        j = self.id_to_idx.get(tgt_id)
+        if i is None or j is None:
+            return 0.0
+
+        return float(self.tfidf_matrix[i].multiply(self.tfidf_matrix[j]).sum())
+
+    def score_batch(self, src_id: str, tgt_ids: list[str]) -> np.ndarray:
+        return self.score_block([src_id], tgt_ids)[0]
+
+    def score_block(self, src_ids: list[str], tgt_ids: list[str]) -> np.ndarray:
+        src_idx = self._indices(src_ids)
+        tgt_idx = self._indices(tgt_ids)
+        scores = np.zeros((len(src_ids), len(tgt_ids)), dtype=np.float64)
+
+        src_ok = src_idx >= 0
+        tgt_ok = tgt_idx >= 0
+        if not src_ok.any() or not tgt_ok.any():
+            return scores
 
-        return float(
-            cosine_similarity(self.tfidf_matrix[i], self.tfidf_matrix[j])[0][0]
+        block = (
+            self.tfidf_matrix[src_idx[src_ok]] @ self.tfidf_matrix[tgt_idx[tgt_ok]].T
         )
+        scores[np.ix_(src_ok, tgt_ok)] = block.toarray()
+        return scores
 
     @property
     def name(self) -> str:
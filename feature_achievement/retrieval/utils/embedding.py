@@ -1,11 +1,29 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from feature_achievement.model_registry import get_model
+from feature_achievement.retrieval.utils.embedding_store import (
+    EmbeddingStore,
+    text_sha,
+)
 
-def build_embedding_index(chapter_texts: dict, model_name: str = "all-MiniLM-L6-v2"):
+
+def load_model(model_name: str):
+    """
+    SentenceTransformer from the process-wide model registry (loaded on
+    first use, then kept warm).
+    """
+    return get_model("sentence_transformers", model_name)
+
+
+def build_embedding_index(
+    chapter_texts: dict,
+    model_name: str = "all-MiniLM-L6-v2",
+    store: EmbeddingStore = None,
+):
     """
     Input:
         chapter_texts: dict[chapter_id] -> text
+        store: optional EmbeddingStore; only texts missing from it are encoded
     Output:
         {
             "chapter_ids": [...],
@@ -16,15 +34,31 @@ def build_embedding_index(chapter_texts: dict, model_name: str = "all-MiniLM-L6-
     chapter_ids = list(chapter_texts.keys())
     corpus = [chapter_texts[cid] or "" for cid in chapter_ids]
 
-    model = SentenceTransformer(model_name)
-    embeddings = model.encode(
-        corpus,
-        normalize_embeddings=True,
-        show_progress_bar=True,
+    if store is None:
+        embeddings = load_model(model_name).encode(
+            corpus,
+            normalize_embeddings=True,
+            show_progress_bar=True,
+        )
+        return {
+            "chapter_ids": chapter_ids,
+            "embeddings": np.asarray(embeddings),
+            "model_name": model_name,
+        }
+
+    shas = [text_sha(text) for text in corpus]
+    text_by_sha = dict(zip(shas, corpus))
+    store.ensure(
+        shas,
+        lambda missing: load_model(model_name).encode(
+            [text_by_sha[sha] for sha in missing],
+            normalize_embeddings=True,
+            show_progress_bar=True,
+        ),
     )
 
     return {
         "chapter_ids": chapter_ids,
-        "embeddings": np.asarray(embeddings),
+        "embeddings": store.get(shas),
         "model_name": model_name,
     }
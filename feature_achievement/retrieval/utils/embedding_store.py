@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_STORE_DIR = os.environ.get(
+    "CHAPTERGRAPH_EMBEDDING_STORE_DIR", os.path.join(".cache", "embeddings")
+)
+
+
+def text_sha(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Chapter-level embedding store for one model:
+
+        <root>/<model_tag>/
+            meta.json     {"model_name": str, "dim": int}
+            ids.json      sha256(chapter_text) -> row
+            vectors.f32   float32 rows, read through np.memmap
+
+    Vectors are keyed by text hash, so a chapter is only re-encoded when its
+    text changes. Writers are serialized by a thread lock plus an flock on
+    <model_tag>/lock, so API workers, job threads and scripts can share a
+    store directory; each add re-reads ids.json under the lock before
+    appending.
+    """
+
+    def __init__(self, model_name: str, root: str = EMBEDDING_STORE_DIR):
+        self.model_name = model_name
+        model_tag = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        self.store_dir = os.path.join(root, model_tag)
+        self.meta_path = os.path.join(self.store_dir, "meta.json")
+        self.ids_path = os.path.join(self.store_dir, "ids.json")
+        self.vectors_path = os.path.join(self.store_dir, "vectors.f32")
+        self.lock_path = os.path.join(self.store_dir, "lock")
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.dim = None
+        self.ids = {}
+        self._ids_stat = None
+        self._vectors = None
+        with self._locked():
+            self._load()
+            if self.ids:
+                self._check_rows()
+
+    @contextmanager
+    def _locked(self):
+        """The thread lock, and the file lock across processes (reentrant)."""
+        with self._lock:
+            lock_file = None
+            if fcntl is not None and not self._lock_depth:
+                lock_file = open(self.lock_path, "a")
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if lock_file is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _load(self):
+        """Pick up meta.json and ids.json as last published by any process."""
+        if not (os.path.exists(self.meta_path) and os.path.exists(self.ids_path)):
+            return
+        stat = os.stat(self.ids_path)
+        if (stat.st_mtime_ns, stat.st_size, stat.st_ino) == self._ids_stat:
+            return
+        with open(self.meta_path, encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        with open(self.ids_path, encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self._ids_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        self._vectors = None
+
+    def _file_rows(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _check_rows(self):
+        """
+        ids.json must match vectors.f32. Rows past the last id (an add that
+        died before publishing ids.json) are cut off; ids pointing past the
+        end of the file mean the store is damaged and it starts over empty.
+        """
+        rows = self._file_rows()
+        if rows < len(self.ids) or set(self.ids.values()) != set(range(len(self.ids))):
+            logger.warning(
+                "embedding store %s: ids.json does not match vectors.f32 "
+                "(%d ids, %d rows), starting empty",
+                self.store_dir,
+                len(self.ids),
+                rows,
+            )
+            self.ids = {}
+        if os.path.exists(self.vectors_path) and (
+            os.path.getsize(self.vectors_path) != len(self.ids) * 4 * self.dim
+        ):
+            os.truncate(self.vectors_path, len(self.ids) * 4 * self.dim)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _mapped(self):
+        if self._vectors is None and self.ids:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.ids), self.dim),
+            )
+        return self._vectors
+
+    def missing(self, shas: list[str]) -> list[str]:
+        return [sha for sha in dict.fromkeys(shas) if sha not in self.ids]
+
+    def ensure(self, shas: list[str], encode):
+        """
+        Add vectors for the shas not in the store yet, holding the store lock
+        from the lookup to the write, so concurrent callers (threads or
+        processes) encode a text once.
+        encode(missing_shas) -> np.ndarray[len(missing_shas), dim].
+        """
+        with self._locked():
+            self._load()
+            missing = self.missing(shas)
+            if missing:
+                self.add(missing, encode(missing))
+
+    def add(self, shas: list[str], vectors: np.ndarray):
+        """Append vectors for shas; shas already stored (or repeated) are skipped."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(shas):
+            return
+
+        with self._locked():
+            # another process may have appended since this one last looked
+            self._load()
+            new_rows = {}
+            for i, sha in enumerate(shas):
+                if sha not in self.ids and sha not in new_rows:
+                    new_rows[sha] = i
+            if not new_rows:
+                return
+            vectors = vectors[list(new_rows.values())]
+
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+
+            # vectors go to disk first; ids.json then publishes their rows
+            # with an atomic rename, so a reader or a crash never sees an id
+            # without its vector
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(len(self.ids) * 4 * self.dim)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            ids = dict(self.ids)
+            for sha in new_rows:
+                ids[sha] = len(ids)
+            tmp_path = self.ids_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(ids, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.ids_path)
+            stat = os.stat(self.ids_path)
+            self._ids_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            self.ids = ids
+            self._vectors = None
+
+    def get(self, shas: list[str]) -> np.ndarray:
+        """
+        Return:
+            np.ndarray[len(shas), dim] float32 (in-memory copy)
+        """
+        if not len(shas):
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        rows = [self.ids[sha] for sha in shas]
+        return np.asarray(self._mapped()[rows])
+
+
+@lru_cache
+def get_embedding_store(model_name: str) -> EmbeddingStore:
+    return EmbeddingStore(model_name)
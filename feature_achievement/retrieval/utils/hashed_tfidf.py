@@ -0,0 +1,119 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+from feature_achievement.retrieval.utils.tfidf import TFIDF_PARAMS
+
+DEFAULT_N_FEATURES = 2**20
+
+
+def _pretokenized(tokens):
+    return tokens
+
+
+class HashedTfidfVectorizer:
+    """
+    TF-IDF over a fixed number of hashed token/bigram buckets instead of a
+    fitted vocabulary, so memory does not grow with the corpus:
+
+        df_            int64[n_features]  document frequency per bucket
+        n_docs_        documents seen so far
+        bucket_tokens_ dict[bucket] -> first token seen there (display only)
+
+    partial_fit accumulates document frequencies chunk by chunk; transform
+    works on any text without a refit. Weights follow TfidfVectorizer
+    (raw counts x smooth idf, L2-normalized rows).
+    """
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES):
+        self.n_features = n_features
+        self.df_ = np.zeros(n_features, dtype=np.int64)
+        self.n_docs_ = 0
+        self.bucket_tokens_ = {}
+        self._analyzer = CountVectorizer(
+            ngram_range=TFIDF_PARAMS["ngram_range"],
+            stop_words=TFIDF_PARAMS["stop_words"],
+        ).build_analyzer()
+        self._hasher = HashingVectorizer(
+            analyzer=_pretokenized,
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+        )
+
+    @property
+    def idf_(self) -> np.ndarray:
+        return np.log((1 + self.n_docs_) / (1 + self.df_)) + 1
+
+    def bucket(self, token: str) -> int:
+        """Same bucket HashingVectorizer puts the token in."""
+        return abs(murmurhash3_32(token, seed=0)) % self.n_features
+
+    def _counts(self, texts):
+        docs = [self._analyzer(text or "") for text in texts]
+        return docs, self._hasher.transform(docs).tocsr()
+
+    def partial_fit(self, texts):
+        docs, counts = self._counts(texts)
+        self._accumulate(docs, counts)
+        return self
+
+    def _accumulate(self, docs, counts):
+        self.df_ += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs_ += counts.shape[0]
+        for tokens in docs:
+            for token in set(tokens):
+                self.bucket_tokens_.setdefault(self.bucket(token), token)
+
+    def _weight(self, counts):
+        return normalize(counts @ sp.diags(self.idf_), norm="l2", copy=False).tocsr()
+
+    def transform(self, texts):
+        _, counts = self._counts(texts)
+        return self._weight(counts)
+
+    def fit_transform(self, texts, chunk_size: int = 1000):
+        """
+        Stream texts in chunks: counts of each chunk are kept (they are the
+        output), document frequencies accumulate as they go.
+        """
+        texts = list(texts)
+        chunks = []
+        for start in range(0, len(texts), chunk_size):
+            docs, counts = self._counts(texts[start : start + chunk_size])
+            self._accumulate(docs, counts)
+            chunks.append(counts)
+
+        if not chunks:
+            return sp.csr_matrix((0, self.n_features))
+        return self._weight(sp.vstack(chunks, format="csr"))
+
+    def token_names(self, bucket_ids) -> list[str]:
+        """Sample token per bucket, "#<bucket>" where none was recorded."""
+        return [self.bucket_tokens_.get(int(i), f"#{int(i)}") for i in bucket_ids]
+
+
+def build_hashed_tfidf_index(
+    chapter_texts: dict, n_features: int = DEFAULT_N_FEATURES, chunk_size=1000
+):
+    """
+    Same output shape as build_tfidf_index, with a HashedTfidfVectorizer:
+        {
+            "chapter_ids": [...],
+            "tfidf_matrix": scipy sparse matrix (n_chapters x n_features),
+            "vectorizer": HashedTfidfVectorizer
+        }
+    """
+    chapter_ids = list(chapter_texts.keys())
+    vectorizer = HashedTfidfVectorizer(n_features=n_features)
+    tfidf_matrix = vectorizer.fit_transform(
+        (chapter_texts[cid] for cid in chapter_ids), chunk_size=chunk_size
+    )
+
+    return {
+        "chapter_ids": chapter_ids,
+        "tfidf_matrix": tfidf_matrix,
+        "vectorizer": vectorizer,
+    }
@@ -2,6 +2,22 @@ import numpy as np
 from collections import defaultdict
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+TFIDF_PARAMS = {
+    "ngram_range": (1, 2),
+    "stop_words": "english",
+    "min_df": 1,  # ⚠️ debug-friendly
+}
+
+
+def has_terms(texts) -> bool:
+    """
+    Whether any text has a token TfidfVectorizer(**TFIDF_PARAMS) keeps;
+    fitting it on a corpus without one (no texts, empty or stop words only)
+    raises. Stops at the first such text.
+    """
+    analyzer = TfidfVectorizer(**TFIDF_PARAMS).build_analyzer()
+    return any(analyzer(text or "") for text in texts)
+
 
 def build_tfidf_index(chapter_texts: dict):
     """
@@ -17,11 +33,7 @@ def build_tfidf_index(chapter_texts: dict):
     chapter_ids = list(chapter_texts.keys())
     corpus = [chapter_texts[cid] or "" for cid in chapter_ids]
 
-    vectorizer = TfidfVectorizer(
-        ngram_range=(1, 2),
-        stop_words="english",
-        min_df=1,  # ⚠️ debug-friendly
-    )
+    vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
 
     tfidf_matrix = vectorizer.fit_transform(corpus)
 
@@ -32,31 +44,67 @@ def build_tfidf_index(chapter_texts: dict):
     }
 
 
-def extract_top_tfidf_tokens(tfidf_index, top_n=20):
+def extract_top_tfidf_token_ids(tfidf_index, top_n=20, as_strings=False):
     """
+    Top-N tokens per chapter, read straight from the CSR arrays.
+    Only each row's nonzeros are touched (argpartition + sort of the top-N),
+    so the vocabulary is never densified.
     Return:
-        dict[chapter_id] -> list[str] (top tf-idf tokens)
+        dict[chapter_id] -> np.ndarray[int] token ids, highest score first
+        (list[str] tokens when as_strings=True)
     """
     chapter_ids = tfidf_index["chapter_ids"]
-    tfidf_matrix = tfidf_index["tfidf_matrix"]
-    feature_names = tfidf_index["vectorizer"].get_feature_names_out()
+    tfidf_matrix = tfidf_index["tfidf_matrix"].tocsr()
+    indptr, indices, data = tfidf_matrix.indptr, tfidf_matrix.indices, tfidf_matrix.data
 
     chapter_top_tokens = {}
 
     for idx, chapter_id in enumerate(chapter_ids):
-        row = tfidf_matrix[idx].toarray().ravel()
-        if row.sum() == 0:
-            chapter_top_tokens[chapter_id] = []
-            continue
+        row_data = data[indptr[idx] : indptr[idx + 1]]
+        row_ids = indices[indptr[idx] : indptr[idx + 1]]
+
+        positive = row_data > 0
+        row_data, row_ids = row_data[positive], row_ids[positive]
 
-        top_indices = np.argsort(row)[-top_n:]
-        tokens = [feature_names[i] for i in top_indices if row[i] > 0]
+        if len(row_data) > top_n:
+            part = np.argpartition(-row_data, top_n - 1)[:top_n]
+            row_data, row_ids = row_data[part], row_ids[part]
 
-        chapter_top_tokens[chapter_id] = tokens
+        # score desc, token id asc on ties -> deterministic
+        chapter_top_tokens[chapter_id] = row_ids[np.lexsort((row_ids, -row_data))]
 
+    if as_strings:
+        return token_ids_to_strings(tfidf_index, chapter_top_tokens)
     return chapter_top_tokens
 
 
+def token_ids_to_strings(tfidf_index, chapter_top_token_ids):
+    """
+    dict[chapter_id] -> token ids  =>  dict[chapter_id] -> list[str]
+    Hashed indexes have no vocabulary; their buckets map to a sample token.
+    """
+    vectorizer = tfidf_index["vectorizer"]
+    if hasattr(vectorizer, "token_names"):
+        return {
+            cid: vectorizer.token_names(token_ids)
+            for cid, token_ids in chapter_top_token_ids.items()
+        }
+
+    feature_names = vectorizer.get_feature_names_out()
+    return {
+        cid: [feature_names[i] for i in token_ids]
+        for cid, token_ids in chapter_top_token_ids.items()
+    }
+
+
+def extract_top_tfidf_tokens(tfidf_index, top_n=20):
+    """
+    Return:
+        dict[chapter_id] -> list[str] (top tf-idf tokens)
+    """
+    return extract_top_tfidf_token_ids(tfidf_index, top_n=top_n, as_strings=True)
+
+
 def build_token_index(chapter_top_tokens):
     """
     token -> set(chapter_id)
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+import numpy as np
+
+from feature_achievement.retrieval.candidates.ann_embedding import IvfIndex
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0):
+    """Clustered, L2-normalized vectors shaped like chapter embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 2.0 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def book_embeddings(model_name: str):
+    from feature_achievement.enrichment import load_all_enriched_data
+    from feature_achievement.retrieval.utils.embedding import build_embedding_index
+    from feature_achievement.retrieval.utils.text import collect_chapter_texts
+
+    enriched_books = load_all_enriched_data("book_content/books.yaml")
+    chapter_texts = collect_chapter_texts(enriched_books)
+    return build_embedding_index(chapter_texts, model_name=model_name)["embeddings"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall and latency of the IVF ANN index vs exact search"
+    )
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--books", action="store_true", help="embed book_content")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.books:
+        vectors = np.asarray(book_embeddings(args.model), dtype=np.float32)
+    else:
+        vectors = synthetic_embeddings(args.n, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = rng.choice(
+        len(vectors), size=min(args.queries, len(vectors)), replace=False
+    )
+    k = min(args.k, len(vectors))
+
+    started = time.perf_counter()
+    index = IvfIndex.build(vectors)
+    print(
+        f"n={len(vectors)} dim={vectors.shape[1]} lists={len(index.centroids)} "
+        f"build={time.perf_counter() - started:.2f}s"
+    )
+
+    exact = []
+    started = time.perf_counter()
+    for q in queries:
+        scores = vectors @ vectors[q]
+        exact.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"exact: {exact_ms:.3f} ms/query")
+
+    for nprobe in args.nprobe:
+        hits = 0
+        latencies = []
+        for q, truth in zip(queries, exact):
+            started = time.perf_counter()
+            ids, _ = index.search(vectors[q], k, nprobe=nprobe)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(truth & set(ids.tolist()))
+        print(
+            f"nprobe={nprobe}: recall@{k}={hits / (k * len(queries)):.3f} "
+            f"mean={np.mean(latencies):.3f} ms p99={np.percentile(latencies, 99):.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import copy
+import tempfile
+import time
+
+from feature_achievement.api.compute import BOOKS_CONFIG, build_retrieval_pipeline
+from feature_achievement.api.jobs import RunProgress
+from feature_achievement.api.routers.compute_edges_request import ComputeEdgesRequest
+from feature_achievement.enrichment import load_all_enriched_data
+from feature_achievement.retrieval.edge_generation import generate_edges
+from feature_achievement.retrieval.index_cache import RetrievalIndexCache
+from feature_achievement.retrieval.utils.text import collect_chapter_texts
+
+
+def replicate_books(enriched_books, copies: int):
+    """Grow the corpus by renaming every book `copies` times."""
+    if copies <= 1:
+        return enriched_books
+
+    books = []
+    for k in range(copies):
+        for book in enriched_books:
+            clone = copy.deepcopy(book)
+            book_id = f"{book['book_id']}-{k}"
+            clone["book_id"] = book_id
+            for chapter in clone["chapters"]:
+                chapter["id"] = f"{book_id}::{chapter['id'].split('::')[1]}"
+            books.append(clone)
+    return books
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark serial vs process-pool edge generation"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--candidate-generator", default="tfidf_token")
+    parser.add_argument("--block-size", type=int, default=256)
+    args = parser.parse_args()
+
+    enriched_books = replicate_books(load_all_enriched_data(BOOKS_CONFIG), args.copies)
+    chapter_texts = collect_chapter_texts(enriched_books)
+    req = ComputeEdgesRequest(
+        book_ids=[b["book_id"] for b in enriched_books],
+        candidate_generator=args.candidate_generator,
+    )
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        pipeline = build_retrieval_pipeline(
+            req, chapter_texts, RetrievalIndexCache(cache_dir), RunProgress(0)
+        )
+    print(f"chapters={len(chapter_texts)} books={len(enriched_books)}")
+
+    baseline = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        edges = generate_edges(
+            enriched_books, pipeline, block_size=args.block_size, workers=workers
+        )
+        seconds = time.perf_counter() - started
+
+        if baseline is None:
+            baseline = (edges, seconds)
+        identical = edges == baseline[0]
+        print(
+            f"workers={workers} edges={len(edges)} seconds={seconds:.3f} "
+            f"speedup={baseline[1] / seconds:.2f}x identical={identical}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import json
+import statistics
+
+from sqlalchemy import text
+
+from feature_achievement.db.engine import engine
+from feature_achievement.db.migrations import (
+    EDGE_INDEXES,
+    _create_run_partition,
+    apply_migrations,
+    edges_partitioned,
+)
+
+BENCH_VERSION = "benchmark_edge_indexes"
+
+QUERIES = {
+    "graph": (
+        "SELECT id, from_chapter, to_chapter, score, type FROM edge "
+        "WHERE run_id = :run_id"
+    ),
+    "graph_page": (
+        "SELECT id, from_chapter, to_chapter, score, type FROM edge "
+        "WHERE run_id = :run_id AND id > :cursor ORDER BY id LIMIT 1000"
+    ),
+    "chapter_in_run": (
+        "SELECT to_chapter, score, type FROM edge "
+        "WHERE run_id = :run_id AND from_chapter = :chapter_id"
+    ),
+    "edges_by_book": (
+        "SELECT edge.* FROM edge JOIN chapter ON edge.from_chapter = chapter.id "
+        "WHERE chapter.book_id = :book_id"
+    ),
+}
+
+
+def seed(conn, n_edges: int, n_runs: int, n_books: int, n_chapters: int):
+    """Benchmark runs, chapters and n_edges edges spread evenly over the runs."""
+    run_ids = (
+        conn.execute(
+            text(
+                "INSERT INTO run (book_ids, enrichment_version, candidate_generator, "
+                "similarity, min_store, storage, state, created_at) "
+                "SELECT '[]', :version, 'tfidf_token', 'tfidf', 0.1, 'rows', "
+                "'succeeded', now() "
+                "FROM generate_series(1, :n) RETURNING id"
+            ),
+            {"version": BENCH_VERSION, "n": n_runs},
+        )
+        .scalars()
+        .all()
+    )
+
+    if edges_partitioned(conn):
+        for run_id in run_ids:
+            _create_run_partition(conn, run_id)
+
+    conn.execute(
+        text(
+            "INSERT INTO chapter (id, book_id, title, chapter_text, created_at) "
+            "SELECT 'bench-' || (g / :c) || '::ch' || (g % :c), 'bench-' || (g / :c), "
+            "'', '', now() FROM generate_series(0, :b * :c - 1) g "
+            "ON CONFLICT (id) DO NOTHING"
+        ),
+        {"b": n_books, "c": n_chapters},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO edge (run_id, from_chapter, to_chapter, score, type, created_at) "
+            "SELECT (:run_ids)[1 + g % :n_runs], "
+            "'bench-' || (g % :b) || '::ch' || ((g / :b) % :c), "
+            "'bench-' || ((g + 1) % :b) || '::ch' || ((g / 7) % :c), "
+            "random(), 'tfidf', now() FROM generate_series(0, :n_edges - 1) g"
+        ),
+        {
+            "run_ids": run_ids,
+            "n_runs": n_runs,
+            "b": n_books,
+            "c": n_chapters,
+            "n_edges": n_edges,
+        },
+    )
+    return run_ids
+
+
+def cleanup(conn, run_ids):
+    conn.execute(text("DELETE FROM edge WHERE run_id = ANY(:ids)"), {"ids": run_ids})
+    conn.execute(text("DELETE FROM run WHERE id = ANY(:ids)"), {"ids": run_ids})
+    conn.execute(text("DELETE FROM chapter WHERE id LIKE 'bench-%'"))
+    if edges_partitioned(conn):
+        for run_id in run_ids:
+            conn.execute(text(f"DROP TABLE IF EXISTS edge_run_{int(run_id)}"))
+
+
+def use_indexes(phase: str):
+    """before: the old single-column indexes; after: the migrations."""
+    with engine.begin() as conn:
+        if phase == "before":
+            for name in EDGE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(
+                text("CREATE INDEX IF NOT EXISTS ix_edge_run_id ON edge (run_id)")
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_edge_from_chapter "
+                    "ON edge (from_chapter)"
+                )
+            )
+    if phase == "after":
+        apply_migrations(engine)
+
+    # index-only scans need an up-to-date visibility map
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE edge"))
+        conn.execute(text("ANALYZE chapter"))
+
+
+def explain(conn, sql: str, params: dict, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        plan = conn.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params
+        ).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        timings.append(plan[0]["Execution Time"])
+
+    node = plan[0]["Plan"]
+    while node.get("Node Type") in ("Limit", "Gather", "Gather Merge", "Append"):
+        node = node["Plans"][0]
+    return statistics.median(timings), node.get("Node Type"), plan_indexes(node)
+
+
+def plan_indexes(node) -> list:
+    """Index names used anywhere in a plan node's subtree (partitions collapsed)."""
+    names = [node["Index Name"]] if "Index Name" in node else []
+    for child in node.get("Plans", []):
+        names += [name for name in plan_indexes(child) if name not in names]
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="EXPLAIN ANALYZE of edge reads before/after the "
+        "covering-index migration"
+    )
+    parser.add_argument("--edges", type=int, default=2_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        run_ids = seed(conn, args.edges, args.runs, args.books, args.chapters)
+    print(f"seeded edges={args.edges} runs={args.runs}")
+
+    params = {
+        "run_id": run_ids[len(run_ids) // 2],
+        "cursor": 0,
+        "chapter_id": "bench-1::ch1",
+        "book_id": "bench-1",
+    }
+    try:
+        for phase in ("before", "after"):
+            use_indexes(phase)
+            with engine.connect() as conn:
+                for name, sql in QUERIES.items():
+                    ms, node_type, indexes = explain(conn, sql, params, args.repeat)
+                    print(
+                        f"{phase:6} {name:15} {ms:9.2f} ms  {node_type}"
+                        + (f" using {', '.join(indexes)}" if indexes else "")
+                    )
+    finally:
+        use_indexes("after")
+        if not args.keep:
+            with engine.begin() as conn:
+                cleanup(conn, run_ids)
+
+
+if __name__ == "__main__":
+    main()
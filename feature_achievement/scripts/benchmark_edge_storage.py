@@ -0,0 +1,200 @@
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from feature_achievement.db.crud import (
+    EDGE_TYPE_CODES,
+    STORAGE_COMPACT,
+    STORAGE_ROWS,
+    run_edges_query,
+)
+from feature_achievement.db.engine import engine
+from feature_achievement.db.migrations import _create_run_partition, edges_partitioned
+from feature_achievement.db.models import Run
+
+BENCH_VERSION = "benchmark_edge_storage"
+
+# chapter i of the seeded corpus
+CHAPTER_ID = "'bench-' || ({i} / :c) || '::ch' || ({i} % :c)"
+
+
+def relation_size(conn, table: str) -> int:
+    """Heap + indexes + TOAST of table, partitions included."""
+    return conn.execute(
+        text(
+            "SELECT coalesce(sum(pg_total_relation_size(relid)), "
+            "pg_total_relation_size(CAST(:table AS regclass))) "
+            "FROM pg_partition_tree(:table)"
+        ),
+        {"table": table},
+    ).scalar()
+
+
+def vacuum(*tables):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in tables:
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+def create_run(conn, storage: str) -> int:
+    return conn.execute(
+        text(
+            "INSERT INTO run (book_ids, enrichment_version, candidate_generator, "
+            "similarity, min_store, storage, state, created_at) "
+            "VALUES ('[]', :version, 'tfidf_token', 'tfidf', 0.1, :storage, "
+            "'succeeded', now()) "
+            "RETURNING id"
+        ),
+        {"version": BENCH_VERSION, "storage": storage},
+    ).scalar()
+
+
+def seed_chapters(conn, n_books: int, n_chapters: int):
+    params = {"c": n_chapters, "n": n_books * n_chapters}
+    conn.execute(
+        text(
+            f"INSERT INTO chapter (id, book_id, title, chapter_text, created_at) "
+            f"SELECT {CHAPTER_ID.format(i='g')}, 'bench-' || (g / :c), '', '', now() "
+            f"FROM generate_series(0, :n - 1) g ON CONFLICT (id) DO NOTHING"
+        ),
+        params,
+    )
+    conn.execute(
+        text(
+            f"INSERT INTO chapterkey (chapter_id) "
+            f"SELECT {CHAPTER_ID.format(i='g')} FROM generate_series(0, :n - 1) g "
+            f"ON CONFLICT (chapter_id) DO NOTHING"
+        ),
+        params,
+    )
+
+
+def seed_rows(conn, run_id: int, n_edges: int, n_chapters: int, n: int):
+    """n_edges distinct (from, to) chapter pairs: from = g % n, to = from + 1 + g / n."""
+    if edges_partitioned(conn):
+        _create_run_partition(conn, run_id)
+    conn.execute(
+        text(
+            f"INSERT INTO edge (run_id, from_chapter, to_chapter, score, type, created_at) "
+            f"SELECT :run_id, {CHAPTER_ID.format(i='(g % :n)')}, "
+            f"{CHAPTER_ID.format(i='((g % :n + 1 + g / :n) % :n)')}, "
+            f"random(), 'tfidf', now() FROM generate_series(0, :n_edges - 1) g"
+        ),
+        {"run_id": run_id, "n_edges": n_edges, "c": n_chapters, "n": n},
+    )
+
+
+def seed_compact(conn, run_id: int, rows_run_id: int):
+    """The same edges as rows_run_id, in the compact layout."""
+    conn.execute(
+        text(
+            "INSERT INTO edgecompact (run_id, from_key, to_key, score, type) "
+            "SELECT :run_id, f.id, t.id, e.score, :type FROM edge e "
+            "JOIN chapterkey f ON f.chapter_id = e.from_chapter "
+            "JOIN chapterkey t ON t.chapter_id = e.to_chapter "
+            "WHERE e.run_id = :rows_run_id"
+        ),
+        {
+            "run_id": run_id,
+            "rows_run_id": rows_run_id,
+            "type": EDGE_TYPE_CODES["tfidf"],
+        },
+    )
+
+
+def cleanup(conn, run_ids):
+    conn.execute(text("DELETE FROM edge WHERE run_id = ANY(:ids)"), {"ids": run_ids})
+    conn.execute(
+        text("DELETE FROM edgecompact WHERE run_id = ANY(:ids)"), {"ids": run_ids}
+    )
+    conn.execute(text("DELETE FROM run WHERE id = ANY(:ids)"), {"ids": run_ids})
+    conn.execute(text("DELETE FROM chapterkey WHERE chapter_id LIKE 'bench-%'"))
+    conn.execute(text("DELETE FROM chapter WHERE id LIKE 'bench-%'"))
+    if edges_partitioned(conn):
+        for run_id in run_ids:
+            conn.execute(text(f"DROP TABLE IF EXISTS edge_run_{int(run_id)}"))
+
+
+def time_reads(run_id: int, repeat: int, page_size: int):
+    """Median seconds of a full /graph edge read and of paging through it."""
+    full, paged = [], []
+    with Session(engine) as session:
+        run = session.get(Run, run_id)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = len(session.exec(run_edges_query(run)).all())
+            full.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            cursor = None
+            while True:
+                page = session.exec(
+                    run_edges_query(run, after=cursor, limit=page_size)
+                ).all()
+                if len(page) < page_size:
+                    break
+                cursor = page[-1][0]
+            paged.append(time.perf_counter() - started)
+    return count, statistics.median(full), statistics.median(paged)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Table size and read speed of one seeded run stored as "
+        "edge rows vs compact edges"
+    )
+    parser.add_argument("--edges", type=int, default=2_000_000)
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--page-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    n = args.books * args.chapters
+    if args.edges > n * (n - 1):
+        parser.error(f"--edges exceeds the {n * (n - 1)} chapter pairs")
+
+    run_ids = []
+    sizes = {}
+    try:
+        with engine.begin() as conn:
+            seed_chapters(conn, args.books, args.chapters)
+        vacuum("edge", "edgecompact", "chapterkey")
+        with engine.connect() as conn:
+            before = {t: relation_size(conn, t) for t in ("edge", "edgecompact")}
+
+        with engine.begin() as conn:
+            rows_run = create_run(conn, STORAGE_ROWS)
+            compact_run = create_run(conn, STORAGE_COMPACT)
+            run_ids += [rows_run, compact_run]
+            seed_rows(conn, rows_run, args.edges, args.chapters, n)
+            seed_compact(conn, compact_run, rows_run)
+        vacuum("edge", "edgecompact")
+        with engine.connect() as conn:
+            for table in ("edge", "edgecompact"):
+                sizes[table] = relation_size(conn, table) - before[table]
+        print(f"seeded edges={args.edges} per layout")
+
+        for storage, run_id, table in (
+            (STORAGE_ROWS, rows_run, "edge"),
+            (STORAGE_COMPACT, compact_run, "edgecompact"),
+        ):
+            count, full, paged = time_reads(run_id, args.repeat, args.page_size)
+            print(
+                f"{storage:8} size={sizes[table] / 2**20:8.1f} MiB "
+                f"({sizes[table] / count:5.1f} B/edge)  "
+                f"read={full * 1000:8.1f} ms  "
+                f"paged({args.page_size})={paged * 1000:8.1f} ms"
+            )
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                cleanup(conn, run_ids)
+
+
+if __name__ == "__main__":
+    main()
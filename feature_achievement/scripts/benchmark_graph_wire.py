@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from feature_achievement.api.graph_wire import (
+    SCORE_BITS,
+    brotli,
+    compress,
+    decode_graph_binary,
+    encode_graph_binary,
+)
+
+
+def synthetic_graph(n_edges: int, n_books: int, chapters_per_book: int, seed=0):
+    """A run-shaped graph: book + chapter nodes, random cross-book edges."""
+    rng = np.random.default_rng(seed)
+    book_ids = [f"book-{b}-in-action" for b in range(n_books)]
+    chapter_ids = [f"{b}::ch{c}" for b in book_ids for c in range(1, chapters_per_book)]
+
+    nodes = [{"id": b, "type": "book", "size": chapters_per_book} for b in book_ids]
+    nodes += [
+        {"id": cid, "type": "chapter", "book_id": cid.split("::")[0], "title": cid}
+        for cid in chapter_ids
+    ]
+    src = rng.integers(len(chapter_ids), size=n_edges)
+    tgt = rng.integers(len(chapter_ids), size=n_edges)
+    scores = rng.uniform(0.1, 1.0, size=n_edges)
+    edges = [
+        {
+            "source": chapter_ids[s],
+            "target": chapter_ids[t],
+            "score": float(sc),
+            "type": "tfidf",
+        }
+        for s, t, sc in zip(src, tgt, scores)
+    ]
+    return {"nodes": nodes, "edges": edges, "next_cursor": None}
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Payload size and decode time: JSON vs binary /graph"
+    )
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--chapters", type=int, default=30)
+    args = parser.parse_args()
+
+    graph = synthetic_graph(args.edges, args.books, args.chapters)
+    bodies = {"json": json.dumps(graph, separators=(",", ":")).encode("utf-8")}
+    for score_bits in SCORE_BITS:
+        bodies[f"binary{score_bits}"], encode_seconds = timed(
+            lambda: encode_graph_binary(graph, score_bits=score_bits)
+        )
+        print(
+            f"edges={args.edges} binary encode (score_bits={score_bits})="
+            f"{encode_seconds * 1000:.1f} ms"
+        )
+
+    encodings = [None, "gzip"] + (["br"] if brotli is not None else [])
+    for name, body in bodies.items():
+        sizes = " ".join(
+            f"{encoding or 'identity'}={len(compress(body, encoding)) / 1024:.0f}KiB"
+            for encoding in encodings
+        )
+        print(f"{name:9} {sizes}")
+
+    _, json_seconds = timed(lambda: json.loads(bodies["json"]))
+    _, binary_seconds = timed(lambda: decode_graph_binary(bodies["binary16"]))
+    print(
+        f"decode to dicts: json={json_seconds * 1000:.1f} ms "
+        f"binary={binary_seconds * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+import numpy as np
+
+from feature_achievement.api.neighbor_index import RunGraphIndex
+
+
+def synthetic_index(n_chapters: int, n_edges: int, seed=0) -> RunGraphIndex:
+    """A run-shaped edge set: random pairs, scores skewed towards min_score."""
+    rng = np.random.default_rng(seed)
+    chapter_ids = np.array([f"book-{i // 40}::ch{i % 40}" for i in range(n_chapters)])
+    src = rng.integers(n_chapters, size=n_edges)
+    dst = rng.integers(n_chapters, size=n_edges)
+    keep = src != dst
+    scores = 0.1 + 0.9 * rng.beta(1.5, 6, size=int(keep.sum()))
+    return RunGraphIndex.from_edges(
+        chapter_ids[src[keep]], chapter_ids[dst[keep]], scores
+    )
+
+
+def latencies(fn, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(*query)
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 99), timings.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="p50/p99 latency of the neighbour index queries on a "
+        "synthetic run"
+    )
+    parser.add_argument("--chapters", type=int, default=5000)
+    parser.add_argument("--edges", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--max-hops", type=int, default=6)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = synthetic_index(args.chapters, args.edges)
+    print(
+        f"chapters={len(index.chapter_ids)} pairs={len(index.neighbors) // 2} "
+        f"build={(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+
+    rng = np.random.default_rng(1)
+    ids = index.chapter_ids
+    pick = lambda: ids[rng.integers(len(ids))]  # noqa: E731
+    cases = {
+        "neighbors": (
+            lambda c: index.top_neighbors(c, k=args.k),
+            [(pick(),) for _ in range(args.queries)],
+        ),
+        "ego": (
+            lambda c: index.ego_subgraph(c, hops=args.hops, k=args.k),
+            [(pick(),) for _ in range(args.queries)],
+        ),
+        "path": (
+            lambda a, b: index.strongest_path(a, b, max_hops=args.max_hops),
+            [(pick(), pick()) for _ in range(args.queries)],
+        ),
+    }
+    for name, (fn, queries) in cases.items():
+        p50, p99, worst = latencies(fn, queries)
+        print(f"{name:9} p50={p50:7.3f} ms  p99={p99:7.3f} ms  max={worst:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# runs in a fresh interpreter so nothing is already imported / loaded
+_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import feature_achievement.api.main
+imported = time.perf_counter() - started
+from feature_achievement.model_registry import preload
+started = time.perf_counter()
+preload(sys.argv[1])
+preloaded = time.perf_counter() - started
+print(json.dumps({
+    "import_seconds": imported,
+    "preload_seconds": preloaded,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in ("spacy", "sentence_transformers", "torch")
+                      if m in sys.modules],
+}))
+"""
+
+
+def probe(preload_specs: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, preload_specs],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold-start time and peak RSS of an API worker process"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--preload",
+        nargs="*",
+        default=[""],
+        help='model specs to compare, e.g. "" "spacy:en_core_web_sm"',
+    )
+    args = parser.parse_args()
+
+    for specs in args.preload:
+        runs = [probe(specs) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["import_seconds"] + r["preload_seconds"])
+        print(
+            f"preload={specs or '-'}: import={best['import_seconds']:.2f}s "
+            f"preload={best['preload_seconds']:.2f}s "
+            f"max_rss={best['max_rss_mb']:.0f} MB "
+            f"heavy_modules={best['heavy_modules']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 import argparse
 from collections import defaultdict
 import numpy as np
-from sqlmodel import Session, select
+from sqlmodel import Session
 
+from feature_achievement.db.crud import run_edges_query
 from feature_achievement.db.engine import engine
-from feature_achievement.db.models import Edge
+from feature_achievement.db.models import Run
 
 
 def summarize_scores(scores: list[float]) -> dict:
@@ -29,16 +30,17 @@ def main():
     args = parser.parse_args()
 
     with Session(engine) as session:
-        edges = session.exec(
-            select(Edge).where(Edge.run_id == args.run_id)
-        ).all()
+        run = session.get(Run, args.run_id)
+        if not run:
+            raise SystemExit(f"run {args.run_id} not found")
+        edges = session.exec(run_edges_query(run)).all()
 
-    scores = [e.score for e in edges]
+    scores = [score for _, _, _, score, _ in edges]
     print("Overall:", summarize_scores(scores))
 
     by_source = defaultdict(list)
-    for e in edges:
-        by_source[e.from_chapter].append(e.score)
+    for _, from_chapter, _, score, _ in edges:
+        by_source[from_chapter].append(score)
 
     topk_scores = []
     for _, vals in by_source.items():
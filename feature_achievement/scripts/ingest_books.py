@@ -0,0 +1,33 @@
+import argparse
+import os
+import time
+
+from feature_achievement.enrichment import load_all_enriched_data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Parse every TOC in a books config into one JSON Lines file"
+    )
+    parser.add_argument("--config", default="book_content/books.yaml")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--output", default=os.path.join("output", "enriched_books.jsonl")
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    enriched_books = load_all_enriched_data(
+        args.config, workers=args.workers, dump_path=args.output
+    )
+    seconds = time.perf_counter() - started
+
+    chapters = sum(len(book["chapters"]) for book in enriched_books)
+    print(
+        f"books={len(enriched_books)} chapters={chapters} "
+        f"workers={args.workers} seconds={seconds:.3f} -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+
+async def client_loop(client, paths, deadline, latencies, errors, bust_cache):
+    while time.perf_counter() < deadline:
+        path = random.choice(paths)
+        if bust_cache and path.startswith("/graph"):
+            # distinct min_score -> distinct cache key, so every request hits the DB
+            path += f"&min_score={random.uniform(0, 1e-6):.12f}"
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            errors.append(path)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_load(base_url, paths, concurrency, seconds, bust_cache):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(
+            *(
+                client_loop(client, paths, deadline, latencies, errors, bust_cache)
+                for _ in range(concurrency)
+            )
+        )
+    return latencies, errors
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concurrent load on the read routes of a running API "
+        "(start it once with CHAPTERGRAPH_DB_ASYNC=0 and once with =1 to compare)"
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--run-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument(
+        "--bust-cache",
+        action="store_true",
+        help="vary min_score so /graph is never served from the response cache",
+    )
+    args = parser.parse_args()
+
+    paths = [
+        f"/graph?run_id={args.run_id}",
+        f"/runs/{args.run_id}/status",
+        "/runs",
+    ]
+    for concurrency in args.concurrency:
+        latencies, errors = asyncio.run(
+            run_load(args.base_url, paths, concurrency, args.seconds, args.bust_cache)
+        )
+        if not latencies:
+            print(f"concurrency={concurrency:3} no successful requests")
+            continue
+        print(
+            f"concurrency={concurrency:3} "
+            f"req/s={len(latencies) / args.seconds:8.1f} "
+            f"p50={statistics.median(latencies) * 1000:7.1f} ms "
+            f"p95={percentile(latencies, 0.95) * 1000:7.1f} ms "
+            f"errors={len(errors)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
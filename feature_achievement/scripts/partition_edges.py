@@ -0,0 +1,7 @@
+from feature_achievement.db.engine import engine
+from feature_achievement.db.migrations import partition_edges_by_run
+import feature_achievement.db.models  # noqa:F401
+
+if __name__ == "__main__":
+    partition_edges_by_run(engine)
+    print("edge table partitioned by run_id")
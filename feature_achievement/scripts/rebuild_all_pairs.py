@@ -0,0 +1,49 @@
+import argparse
+import json
+
+from sqlmodel import Session
+
+from feature_achievement.api.compute import BOOKS_CONFIG, create_run, execute_run
+from feature_achievement.api.jobs import FAILED, RUNNING, record_run_state
+from feature_achievement.api.routers.compute_edges_request import ComputeEdgesRequest
+from feature_achievement.db.engine import engine
+from feature_achievement.enrichment import load_all_enriched_data
+from feature_achievement.retrieval.index_cache import RetrievalIndexCache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline full-library rebuild: exact all-pairs similarity run"
+    )
+    parser.add_argument("--similarity", default="tfidf", choices=["tfidf", "embedding"])
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--min-score", type=float, default=0.1)
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--memory-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    book_ids = [b["book_id"] for b in load_all_enriched_data(BOOKS_CONFIG)]
+    req = ComputeEdgesRequest(
+        book_ids=book_ids,
+        candidate_generator="all_pairs",
+        similarity=args.similarity,
+        embedding_model=args.embedding_model,
+        min_score=args.min_score,
+        top_k=args.top_k,
+        all_pairs_memory_mb=args.memory_mb,
+    )
+
+    with Session(engine) as session:
+        run = create_run(session, req, state=RUNNING)
+        try:
+            result = execute_run(req, run.id, session, RetrievalIndexCache())
+        except Exception as exc:
+            session.rollback()
+            record_run_state(run.id, FAILED, f"{type(exc).__name__}: {exc}")
+            raise
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import {
     findNodeAtPosition,
 } from "./graph-core-dist/buildView.js";
 import { reducer as coreReducer } from "./graph-core-dist/reducer.js";
+import { decodeGraphColumns } from "./graph-core-dist/wire.js";
 
 const API =
     new URLSearchParams(window.location.search).get("api") ??
@@ -86,8 +87,16 @@ function App() {
     useEffect(() => {
         if (!selectedRun) return;
         dispatch({ type: "LOAD_GRAPH_START" });
-        fetch(`${API}/graph?run_id=${selectedRun}`)
-            .then((res) => res.json())
+        // 8-bit scores are plenty for edge width/opacity and the layout
+        fetch(`${API}/graph?run_id=${selectedRun}&format=binary&score_bits=8`)
+            .then((res) => {
+                // an error body is JSON, not a CGB2 payload
+                if (!res.ok) {
+                    throw new Error(`GET /graph: ${res.status} ${res.statusText}`);
+                }
+                return res.arrayBuffer();
+            })
+            .then(decodeGraphColumns)
             .then((data) => {
                 dispatch({
                     type: "LOAD_GRAPH_SUCCESS",
@@ -130,13 +130,21 @@ export function buildView(
         }
     });
 
-    state.graph.edges.forEach(e => {
-        const s = `chapter-${e.source}`;
-        const t = `chapter-${e.target}`;
-        if (visibleChapterIds.has(s) && visibleChapterIds.has(t)) {
-            nextLinks.push({ source: s, target: t, score: e.score });
-        }
+    // view id of each visible chapter by id-table index: the edge loop below
+    // reads the typed-array columns without building a string per edge
+    const { ids, source, target, score } = state.graph;
+    const visibleViewIds: (string | undefined)[] = new Array(ids.length);
+    ids.forEach((chapterId, i) => {
+        const id = `chapter-${chapterId}`;
+        if (visibleChapterIds.has(id)) visibleViewIds[i] = id;
     });
+    for (let i = 0; i < source.length; i += 1) {
+        const s = visibleViewIds[source[i]];
+        const t = visibleViewIds[target[i]];
+        if (s !== undefined && t !== undefined) {
+            nextLinks.push({ source: s, target: t, score: score[i] });
+        }
+    }
 
     return { nodes: nextNodes, links: nextLinks };
 }
@@ -15,6 +15,19 @@ export type GraphEdge = {
 export type Graph = {
     nodes: GraphNode[];
     edges: GraphEdge[];
+    next_cursor?: number | null;
+};
+
+// Graph with its edges as typed-array columns (binary /graph, see wire.ts)
+export type GraphColumns = {
+    ids: string[];
+    nodes: GraphNode[];
+    edgeTypes: string[];
+    source: Uint32Array;
+    target: Uint32Array;
+    score: Float32Array;
+    type: Uint8Array;
+    nextCursor: number | null;
 };
 
 export type ViewNode = {
@@ -51,7 +64,7 @@ export type Dimensions = {
 // Action types
 export type Action =
     | { type: "LOAD_GRAPH_START" }
-    | { type: "LOAD_GRAPH_SUCCESS"; graph: Graph }
+    | { type: "LOAD_GRAPH_SUCCESS"; graph: GraphColumns }
     | { type: "TOGGLE_BOOK"; bookId: string }
     | { type: "SET_HOVERED_NODE"; node: ViewNode | null }
     | { type: "SET_TRANSFORM"; transform: Transform }
@@ -61,7 +74,7 @@ export type Action =
 // Core state
 export interface CoreState {
     uiPhase: UIPhase;
-    graph: Graph | null;
+    graph: GraphColumns | null;
     expandedBooks: Set<string>;
     dimensions: Dimensions;
     nodes: ViewNode[];
@@ -0,0 +1,116 @@
+import type { Graph, GraphColumns, GraphEdge, GraphNode } from "./types";
+
+export type { GraphColumns } from "./types";
+
+// Decoder for the binary /graph payload (`/graph?format=binary`), see
+// feature_achievement/api/graph_wire.py for the layout.
+const MAGIC = "CGB2";
+
+export const GRAPH_BINARY_MEDIA_TYPE = "application/vnd.chaptergraph.graph";
+
+// Unsigned LEB128 values of bytes into out; returns out.
+function readVarints(bytes: Uint8Array, out: Uint32Array): Uint32Array {
+    let pos = 0;
+    for (let i = 0; i < out.length; i += 1) {
+        let value = 0;
+        let shift = 0;
+        let byte: number;
+        do {
+            byte = bytes[pos];
+            pos += 1;
+            value += (byte & 0x7f) * 2 ** shift;
+            shift += 7;
+        } while (byte & 0x80);
+        out[i] = value;
+    }
+    return out;
+}
+
+// Edge arrays of the payload; ids[source[i]] -> ids[target[i]], edges sorted
+// by source, then target.
+export function decodeGraphColumns(buffer: ArrayBuffer): GraphColumns {
+    const bytes = new Uint8Array(buffer);
+    const magic = String.fromCharCode(bytes[0], bytes[1], bytes[2], bytes[3]);
+    if (magic !== MAGIC) {
+        throw new Error("not a CGB2 graph payload");
+    }
+
+    const headerLength = new DataView(buffer).getUint32(4, true);
+    const header = JSON.parse(
+        new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)),
+    );
+    const n: number = header.n_edges;
+    const ids: string[] = header.ids;
+
+    let offset = 8 + headerLength;
+    const degree = readVarints(
+        bytes.subarray(offset, offset + header.degree_bytes),
+        new Uint32Array(ids.length),
+    );
+    offset += header.degree_bytes;
+    const target = readVarints(
+        bytes.subarray(offset, offset + header.target_bytes),
+        new Uint32Array(n),
+    );
+    offset += header.target_bytes;
+
+    // sources from the per-id edge counts, targets from the in-row deltas
+    const source = new Uint32Array(n);
+    let edge = 0;
+    for (let id = 0; id < degree.length; id += 1) {
+        const end = edge + degree[id];
+        for (let i = edge; i < end; i += 1) {
+            source[i] = id;
+            if (i > edge) target[i] += target[i - 1];
+        }
+        edge = end;
+    }
+
+    // score byte planes, most significant first
+    const planes: number = header.score_bits / 8;
+    const step =
+        (header.score_max - header.score_min) / (2 ** header.score_bits - 1);
+    const score = new Float32Array(n);
+    for (let i = 0; i < n; i += 1) {
+        let quantized = 0;
+        for (let p = 0; p < planes; p += 1) {
+            quantized = quantized * 256 + bytes[offset + p * n + i];
+        }
+        score[i] = header.score_min + quantized * step;
+    }
+    offset += planes * n;
+    const type = bytes.subarray(offset, offset + n);
+
+    const nodes = (header.nodes as Omit<GraphNode, "id">[]).map(
+        (node, i) => ({ id: ids[i], ...node }) as GraphNode,
+    );
+
+    return {
+        ids,
+        nodes,
+        edgeTypes: header.edge_types,
+        source,
+        target,
+        score,
+        type,
+        nextCursor: header.next_cursor ?? null,
+    };
+}
+
+// Same Graph shape as the JSON response.
+export function decodeGraph(buffer: ArrayBuffer): Graph {
+    const columns = decodeGraphColumns(buffer);
+    const { ids, source, target, score, type, edgeTypes } = columns;
+
+    const edges: GraphEdge[] = new Array(source.length);
+    for (let i = 0; i < source.length; i += 1) {
+        edges[i] = {
+            source: ids[source[i]],
+            target: ids[target[i]],
+            score: score[i],
+            type: edgeTypes[type[i]],
+        };
+    }
+
+    return { nodes: columns.nodes, edges, next_cursor: columns.nextCursor };
+}